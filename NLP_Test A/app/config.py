@@ -1,12 +1,220 @@
+import os
 
-LLM_API_URL = 'https://api.us.inc/usf/v1/hiring/chat/completions'
+
+# Both URLs can be pointed at benchmarks/fake_upstream.py for load tests
+LLM_API_URL = os.getenv("LLM_API_URL", 'https://api.us.inc/usf/v1/hiring/chat/completions')
 LLM_MODEL = 'usf1-mini'
 LLM_HEADERS = {
     "Authorization": ""
 }
 
-USF_API_URL = 'https://api.us.inc/usf/v1'
+USF_API_URL = os.getenv("USF_API_URL", 'https://api.us.inc/usf/v1')
+EMBEDDING_MODEL = 'usf1-embed'
 EMBEDDING_HEADERS = {
     "x-api-key": ""
 }
 
+# Shared upstream HTTP client pool
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+HTTP_KEEPALIVE_EXPIRY = 30.0
+HTTP2_ENABLED = False
+
+# Per-upstream timeouts (seconds)
+LLM_TIMEOUT = 30.0
+EMBEDDING_TIMEOUT = 15.0
+RERANK_TIMEOUT = 15.0
+WEBHOOK_TIMEOUT = 30.0
+HTTP_CONNECT_TIMEOUT = 5.0
+
+# Max list items processed concurrently per request
+BATCH_CONCURRENCY_LIMIT = 8
+
+# Local embedding-based topic gate (falls back to the LLM when uncertain)
+TOPIC_ROUTER_ENABLED = True
+TOPIC_ROUTER_CONFIDENCE_MARGIN = 0.05
+TOPIC_ROUTER_MAX_DOCUMENTS = 500
+TOPIC_ROUTER_REFRESH_SECONDS = 300
+# Wait before retrying a failed centroid build (the LLM gate is used meanwhile)
+TOPIC_ROUTER_RETRY_SECONDS = 30
+TOPIC_ROUTER_POSITIVE_SEEDS = [
+    "Deep learning with neural networks, CNNs, RNNs and transformers",
+    "Machine learning models, training data, supervised and unsupervised learning",
+    "Agentic AI systems where LLM agents plan, use tools and act autonomously",
+    "Gradient descent, backpropagation, loss functions and model evaluation",
+]
+TOPIC_ROUTER_NEGATIVE_SEEDS = [
+    "Cooking recipes, restaurants and food reviews",
+    "Sports results, football matches and player transfers",
+    "Travel plans, hotels and holiday destinations",
+    "Politics, elections and government policy",
+    "Customer support request about a delayed order or refund",
+    "Weather forecast, rain and temperature for the weekend",
+]
+
+# Inputs up to this many characters are enriched before the task call
+ENRICH_MAX_INPUT_CHARS = 200
+
+# Shared Redis instance
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Embedding cache
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_MAX_ENTRIES = 10000
+EMBEDDING_CACHE_TTL_SECONDS = 24 * 3600
+EMBEDDING_CACHE_REDIS_ENABLED = False
+EMBEDDING_CACHE_REDIS_PREFIX = "nlp:emb:"
+
+# Task response cache
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_MAX_ENTRIES = 2000
+RESPONSE_CACHE_TTL_SECONDS = 3600
+RESPONSE_CACHE_DISABLED_TASKS = []
+RESPONSE_CACHE_SEMANTIC_ENABLED = False
+RESPONSE_CACHE_SEMANTIC_MAX_DISTANCE = 0.05
+
+# Document ingestion
+INGEST_BATCH_SIZE = 64
+INGEST_CONCURRENCY = 4
+# Largest {"documents": [...]} .json upload, which has to be parsed in memory (NDJSON is streamed)
+BULK_UPLOAD_MAX_JSON_BYTES = 50 * 1024 * 1024
+
+# Collection stats cache and document listing
+COLLECTION_STATS_TTL_SECONDS = 10
+DOCUMENT_LIST_DEFAULT_LIMIT = 100
+DOCUMENT_LIST_MAX_LIMIT = 1000
+# SQLite index of document ids that listing pages through (shared by all processes)
+DOCUMENT_ID_INDEX_PATH = "./document_ids.db"
+
+# Thread pools for blocking vector store calls (reads and writes are kept apart)
+VECTOR_STORE_READ_WORKERS = 8
+VECTOR_STORE_WRITE_WORKERS = 2
+
+# Background jobs for webhook-mode requests.
+# "celery" dispatches to the Celery workers; "local" runs jobs in the API process (no broker needed).
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "celery")
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
+# "redis" shares task status across API and worker processes; "memory" is an in-process stand-in
+TASK_STORE_BACKEND = os.getenv("TASK_STORE_BACKEND", "redis")
+TASK_RESULT_TTL_SECONDS = 3600
+
+# Webhook delivery (background workers, retries and durable outbox)
+WEBHOOK_OUTBOX_PATH = "./webhook_outbox.db"
+WEBHOOK_WORKERS = 4
+WEBHOOK_QUEUE_MAX = 1000
+WEBHOOK_MAX_ATTEMPTS = 6
+WEBHOOK_BACKOFF_BASE_SECONDS = 1.0
+WEBHOOK_BACKOFF_MAX_SECONDS = 300.0
+WEBHOOK_PER_HOST_CONCURRENCY = 4
+WEBHOOK_BREAKER_FAILURE_THRESHOLD = 5
+WEBHOOK_BREAKER_RESET_SECONDS = 30.0
+WEBHOOK_SWEEP_INTERVAL_SECONDS = 5.0
+# Dead (out of attempts) outbox rows are kept this long for inspection, then pruned
+WEBHOOK_DEAD_RETENTION_SECONDS = 7 * 24 * 3600
+
+# Micro-batching of concurrent embedding / rerank calls
+EMBEDDING_BATCH_ENABLED = True
+EMBEDDING_BATCH_WINDOW_MS = 3.0
+EMBEDDING_BATCH_MAX_SIZE = 64
+RERANK_COALESCE_ENABLED = True
+RERANK_BATCH_WINDOW_MS = 3.0
+RERANK_BATCH_MAX_SIZE = 64
+RERANK_MODEL = 'usf1-rerank'
+
+# Adaptive reranking: retrieve top_k * factor candidates, rerank them and keep top_k
+RERANK_OVERFETCH_FACTOR = 3
+# Skip the reranker when the best hit leads the runner-up by at least this cosine distance
+# (both backends report cosine distance, so vector scores are cosine similarities)
+RERANK_SKIP_DISTANCE_GAP = 0.08
+# Retrieval latency budget; the reranker is skipped or cut short to stay within it
+RERANK_LATENCY_BUDGET_MS = 400.0
+RERANK_SCORE_CACHE_MAX_ENTRIES = 50000
+RERANK_SCORE_CACHE_TTL_SECONDS = 3600
+
+# /rag/query endpoints: queries per batch request (embedded in one call), max top_k and
+# how many queries of a batch are reranked concurrently
+RAG_QUERY_BATCH_MAX_QUERIES = 256
+RAG_QUERY_MAX_TOP_K = 50
+RAG_QUERY_RERANK_CONCURRENCY = 8
+
+# Single-flight: concurrent identical NLP requests, retrievals and embedding calls share one in-flight execution
+SINGLEFLIGHT_ENABLED = True
+
+# Vector store backend: "chroma" (persistent Chroma client) or "numpy" (in-process index with mmap snapshots)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "chroma")
+CHROMA_PATH = "./chroma_db"
+VECTOR_STORE_NUMPY_PATH = "./numpy_index"
+# float32, or float16 / int8 to shrink the matrix
+VECTOR_STORE_NUMPY_DTYPE = "float32"
+
+# End-to-end deadline for one NLP request (all items, stages and upstream calls)
+REQUEST_DEADLINE_SECONDS = 45.0
+# Enrichment is skipped when less than this is left, so the task call still fits
+DEADLINE_ENRICH_MIN_SECONDS = 20.0
+
+# Hedged requests: duplicate a call still running after the upstream's recent latency percentile
+HEDGE_ENABLED = True
+# LLM completions are expensive to duplicate, so only the cheap upstreams are hedged by default
+HEDGE_UPSTREAMS = ["embedding", "rerank"]
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_DELAY_MS = 20.0
+HEDGE_MAX_DELAY_MS = 2000.0
+HEDGE_MIN_SAMPLES = 20
+# At most this fraction of calls is hedged
+HEDGE_MAX_RATIO = 0.1
+UPSTREAM_LATENCY_WINDOW = 200
+UPSTREAM_BREAKER_FAILURE_THRESHOLD = 5
+UPSTREAM_BREAKER_RESET_SECONDS = 30.0
+
+# Client-side limits per upstream: request rate (token bucket refill per second), burst and calls
+# in flight. None leaves a limit off. Calls wait for capacity within their timeout and deadline,
+# at most UPSTREAM_LIMIT_MAX_WAIT_SECONDS when they have neither
+UPSTREAM_LIMITS = {
+    "llm": {"rate_per_second": 20.0, "burst": 40, "max_concurrency": 32},
+    "embedding": {"rate_per_second": 100.0, "burst": 200, "max_concurrency": 32},
+    "rerank": {"rate_per_second": 50.0, "burst": 100, "max_concurrency": 16},
+}
+UPSTREAM_LIMIT_MAX_WAIT_SECONDS = 10.0
+
+# Admission control for POST /nlp/* and /rag/*: requests run at most ADMISSION_MAX_CONCURRENT
+# at a time; the rest wait in a bounded queue, highest priority first. "interactive" is the
+# default, "batch" is set by the X-Request-Priority header or a batch path, and "background" is
+# used by queued webhook jobs
+ADMISSION_ENABLED = True
+ADMISSION_MAX_CONCURRENT = 64
+ADMISSION_QUEUE_MAX = 256
+ADMISSION_PRIORITIES = ["interactive", "batch", "background"]
+ADMISSION_BATCH_PATHS = ["/rag/query/batch", "/rag/documents/bulk", "/rag/documents/add"]
+# Longest expected or actual queue wait before a request is shed with Retry-After
+# (503 for interactive, 429 for batch); None never sheds (background jobs just wait their turn)
+ADMISSION_MAX_WAIT_SECONDS = {"interactive": 5.0, "batch": 30.0, "background": None}
+
+# Generation settings per kind of LLM call; missing keys fall back to "default"
+LLM_GENERATION_PROFILES = {
+    "default": {"max_tokens": 1000, "temperature": 0.7, "web_search": True},
+    # Yes/no topic check
+    "gate": {"max_tokens": 3, "temperature": 0.0, "web_search": False},
+    # Background information about a short query; the only call that needs web search
+    "enrich": {"max_tokens": 600, "temperature": 0.5, "web_search": True},
+    "enrich_rag": {"max_tokens": 600, "temperature": 0.3, "web_search": False},
+    "classify": {"max_tokens": 100, "temperature": 0.0, "web_search": False},
+    "sentiment": {"max_tokens": 60, "temperature": 0.0, "web_search": False},
+    "entities": {"max_tokens": 400, "temperature": 0.0, "web_search": False},
+    "summarize": {"max_tokens": 400, "temperature": 0.3, "web_search": False},
+}
+# One JSON object answering every task: room for all per-task answers plus the JSON keys and escaping
+ANALYZE_JSON_OVERHEAD_TOKENS = 150
+LLM_GENERATION_PROFILES["analyze"] = {
+    "max_tokens": sum(
+        LLM_GENERATION_PROFILES[task]["max_tokens"] for task in ("classify", "sentiment", "entities", "summarize")
+    ) + ANALYZE_JSON_OVERHEAD_TOKENS,
+    "temperature": 0.0,
+    "web_search": False,
+}
+
+# Retrieved context packed into a prompt, in (estimated) tokens
+CONTEXT_TOKEN_BUDGET = 1500
+# A passage that does not fit is truncated only if at least this much room is left
+CONTEXT_MIN_PASSAGE_TOKENS = 64
+# Passages sharing this fraction of their 5-word shingles with a better one are dropped
+CONTEXT_DEDUP_OVERLAP = 0.8
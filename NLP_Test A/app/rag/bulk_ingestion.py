@@ -0,0 +1,170 @@
+import asyncio
+import json
+import time
+import uuid
+import logging
+from dataclasses import dataclass, field, asdict
+from typing import AsyncIterator, Dict, List, Optional
+from app.rag.document_ingestion import document_ingestion_service
+from app.services.task_store import task_store
+from app.config import INGEST_BATCH_SIZE, INGEST_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+MAX_REPORTED_ERRORS = 20
+# Job reports share the task store (and its TTL) with NLP tasks, under their own prefix
+JOB_KEY_PREFIX = "bulk:"
+
+
+@dataclass
+class IngestionJob:
+    job_id: str
+    status: str = "running"
+    received: int = 0
+    upserted: int = 0
+    skipped: int = 0
+    failed: int = 0
+    batches_done: int = 0
+    errors: List[str] = field(default_factory=list)
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def record_error(self, message: str):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    def to_dict(self) -> Dict:
+        report = asdict(self)
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        report["elapsed_seconds"] = round(elapsed, 3)
+        report["docs_per_second"] = round(self.received / elapsed, 1) if elapsed > 0 else 0.0
+        return report
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines without buffering the whole body."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buffer:
+        yield buffer.decode("utf-8")
+
+
+class BulkIngestionService:
+    """
+    Streaming, batched and idempotent ingestion of NDJSON documents ({"id", "text", "metadata"?}).
+    Batches are embedded and upserted with bounded concurrency; unchanged documents are
+    skipped by content hash, so re-running an interrupted job only does the remaining work.
+    Progress reports are published to the task store after every batch, so any process can
+    serve them and they expire with TASK_RESULT_TTL_SECONDS; only running jobs stay in memory.
+    """
+
+    def __init__(self, batch_size: int = INGEST_BATCH_SIZE, concurrency: int = INGEST_CONCURRENCY):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.jobs: Dict[str, IngestionJob] = {}
+
+    async def _publish(self, job: IngestionJob):
+        report = job.to_dict()
+        try:
+            await task_store.set(JOB_KEY_PREFIX + job.job_id, report.pop("status"), **report)
+        except Exception as e:
+            logger.warning(f"Could not publish progress of bulk ingestion job {job.job_id}: {str(e)}")
+
+    async def get_job(self, job_id: str) -> Optional[Dict]:
+        """Report of a running job of this process, or the last published report of any job."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        record = await task_store.get(JOB_KEY_PREFIX + job_id)
+        if record is None:
+            return None
+        record = dict(record)
+        record.pop("task_id", None)
+        record.pop("updated_at", None)
+        return record
+
+    async def _run_batch(self, job: IngestionJob, batch: List[Dict], semaphore: asyncio.Semaphore):
+        try:
+            # Last occurrence wins when an id repeats inside one batch
+            unique = list({doc["id"]: doc for doc in batch}.values())
+            documents = [{"id": doc["id"], "text": doc["text"]} for doc in unique]
+            metadata = [doc.get("metadata") for doc in unique]
+            outcome = await document_ingestion_service.upsert_documents(documents, metadata)
+            job.upserted += outcome["upserted"]
+            job.skipped += outcome["skipped"] + len(batch) - len(unique)
+        except Exception as e:
+            job.failed += len(batch)
+            job.record_error(f"Batch starting at {batch[0]['id']!r} failed: {str(e)}")
+            logger.error(f"Bulk ingestion batch failed for job {job.job_id}: {str(e)}")
+        finally:
+            job.batches_done += 1
+            semaphore.release()
+        await self._publish(job)
+
+    async def ingest(self, lines: AsyncIterator[str], job_id: Optional[str] = None) -> IngestionJob:
+        job = IngestionJob(job_id=job_id or str(uuid.uuid4()))
+        self.jobs[job.job_id] = job
+        await self._publish(job)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pending = set()
+        batch: List[Dict] = []
+
+        async def flush(docs: List[Dict]):
+            # Acquire before scheduling so the reader never runs far ahead of the embedders
+            await semaphore.acquire()
+            task = asyncio.create_task(self._run_batch(job, docs, semaphore))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        try:
+            line_number = 0
+            async for line in lines:
+                line_number += 1
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    doc = json.loads(line)
+                    if not isinstance(doc, dict) or not doc.get("id") or not isinstance(doc.get("text"), str):
+                        raise ValueError("expected an object with 'id' and 'text'")
+                except ValueError as e:
+                    job.failed += 1
+                    job.record_error(f"Line {line_number}: {str(e)}")
+                    continue
+                job.received += 1
+                batch.append(doc)
+                if len(batch) >= self.batch_size:
+                    await flush(batch)
+                    batch = []
+            if batch:
+                await flush(batch)
+            if pending:
+                await asyncio.gather(*pending)
+            await document_ingestion_service.store.flush()
+            job.status = "completed" if not job.failed else "completed_with_errors"
+        except Exception as e:
+            job.status = "failed"
+            job.record_error(str(e))
+            logger.error(f"Bulk ingestion job {job.job_id} failed: {str(e)}")
+        finally:
+            job.finished_at = time.time()
+            self.jobs.pop(job.job_id, None)
+        await self._publish(job)
+        logger.info(
+            f"Bulk ingestion job {job.job_id}: {job.upserted} upserted, {job.skipped} unchanged, {job.failed} failed"
+        )
+        return job
+
+    async def ingest_documents(self, documents: List[Dict], job_id: Optional[str] = None) -> IngestionJob:
+        """Ingest an already-parsed list, e.g. a {"documents": [...]} JSON file."""
+        async def as_lines():
+            for doc in documents:
+                yield json.dumps(doc)
+        return await self.ingest(as_lines(), job_id)
+
+
+bulk_ingestion_service = BulkIngestionService()
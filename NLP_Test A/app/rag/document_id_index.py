@@ -0,0 +1,77 @@
+import sqlite3
+import threading
+import time
+import logging
+from typing import List, Optional, Sequence
+from app.config import DOCUMENT_ID_INDEX_PATH
+
+logger = logging.getLogger(__name__)
+
+# A backfill claimed by a process that then died may be taken over after this long
+BACKFILL_LEASE_SECONDS = 600.0
+
+
+class DocumentIdIndex:
+    """
+    SQLite index of stored document ids, kept next to the vector store so listing can page
+    by id: each page is one ordered range read after the last id returned, whatever the
+    corpus size and however documents are added in between. Shared by all processes.
+    """
+
+    def __init__(self, path: str = DOCUMENT_ID_INDEX_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS document_ids (id TEXT PRIMARY KEY) WITHOUT ROWID")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS index_state (key TEXT PRIMARY KEY, value REAL NOT NULL)")
+            self._conn.commit()
+        return self._conn
+
+    def add(self, ids: Sequence[str]):
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("INSERT OR IGNORE INTO document_ids (id) VALUES (?)", [(doc_id,) for doc_id in ids])
+            conn.commit()
+
+    def page(self, after: Optional[str], limit: int) -> List[str]:
+        """Up to `limit` ids greater than `after` (all from the start when None), in id order."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id FROM document_ids WHERE id > ? ORDER BY id LIMIT ?",
+                (after if after is not None else "", limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def claim_backfill(self) -> bool:
+        """
+        Claim the one-off backfill from the vector store. Exactly one process gets True;
+        False once it is done or while another process holds an unexpired claim.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            if conn.execute("SELECT 1 FROM index_state WHERE key = 'backfilled'").fetchone():
+                return False
+            cursor = conn.execute(
+                "INSERT INTO index_state (key, value) VALUES ('backfill_claimed', ?) "
+                "ON CONFLICT (key) DO UPDATE SET value = excluded.value WHERE index_state.value < ?",
+                (now, now - BACKFILL_LEASE_SECONDS)
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+
+    def mark_backfilled(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO index_state (key, value) VALUES ('backfilled', ?)", (time.time(),))
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,32 +1,89 @@
-import chromadb
-from typing import List, Dict, Optional
+import asyncio
+import base64
+import hashlib
+import time
+from typing import Any, List, Dict, Optional
 from dataclasses import dataclass
 from app.rag.embedding_client import get_embeddings
+from app.rag.document_id_index import DocumentIdIndex
+from app.rag.vector_store import AsyncVectorStore, cosine_distance_scale, open_collection
+from app.config import (
+    INGEST_BATCH_SIZE,
+    INGEST_CONCURRENCY,
+    EMBEDDING_MODEL,
+    COLLECTION_STATS_TTL_SECONDS,
+    DOCUMENT_LIST_DEFAULT_LIMIT,
+    DOCUMENT_LIST_MAX_LIMIT,
+)
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Page size of the one-off id index backfill
+ID_BACKFILL_PAGE_SIZE = 1000
+
+def _encode_cursor(doc_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"after": doc_id}).encode()).decode()
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[str]:
+    """The id of the last document already returned, or None for the first page."""
+    if not cursor:
+        return None
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())["after"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(after, str):
+        raise ValueError("Invalid cursor")
+    return after
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
 @dataclass
 class Document:
     id: str
     text: str
     embedding: List[float]
+    # Cosine distance to the query, whatever the collection's own distance space
+    distance: Optional[float] = None
     
 
 class DocumentIngestionService:
     def __init__(self):
-        self.chroma_client = chromadb.PersistentClient(path="./chroma_db")
-        self.collection = self.chroma_client.get_or_create_collection("documents")
+        # Chroma or the in-process NumPy index, selected by VECTOR_STORE_BACKEND
+        self.collection = open_collection()
+        self._distance_scale = cosine_distance_scale(self.collection)
+        # All collection calls go through the thread-pooled facade, off the event loop
+        self.store = AsyncVectorStore(self.collection)
+        # Id-ordered index for listing, maintained alongside every upsert
+        self.id_index = DocumentIdIndex()
         self.documents = {} 
         self.document_ids = [] 
+        self._stats: Optional[Dict[str, Any]] = None
+        self._stats_expires_at = 0.0
+        self._last_modified: Optional[float] = None
+        self._dimension: Optional[int] = None
 
-    async def add_documents_to_knowledge_base(self, documents: List[Dict[str, str]], metadata: Optional[List[Dict]] = None):
-        texts = [doc['text'] for doc in documents]
+    async def upsert_documents(self, documents: List[Dict[str, str]], metadata: Optional[List[Dict]] = None) -> Dict[str, int]:
+        """
+        Embed and upsert one batch of documents. Documents whose content hash matches
+        the stored one are skipped, so re-sending unchanged documents is cheap.
+        """
         doc_ids = [doc['id'] for doc in documents]
+        hashes = [content_hash(doc['text']) for doc in documents]
         
-        logger.info(f"Adding {len(documents)} documents to knowledge base")
+        existing = await self.store.get(ids=doc_ids, include=["metadatas"])
+        stored_hashes = {
+            doc_id: (meta or {}).get("content_hash")
+            for doc_id, meta in zip(existing.get('ids', []), existing.get('metadatas') or [])
+        }
+        changed = [i for i, doc_id in enumerate(doc_ids) if stored_hashes.get(doc_id) != hashes[i]]
+        if not changed:
+            return {"upserted": 0, "skipped": len(documents), "embeddings_generated": 0}
         
+        texts = [documents[i]['text'] for i in changed]
         embedding_response = await get_embeddings(texts)
         
         # Extract embeddings from the correct nested structure
@@ -36,67 +93,181 @@ class DocumentIngestionService:
         # Check each embedding
         for i, emb in enumerate(embeddings):
             if not emb:
-                logger.warning(f"Empty embedding for document {i}!")
+                logger.warning(f"Empty embedding for document {doc_ids[changed[i]]}!")
+        if len(embeddings) != len(changed):
+            raise ValueError(f"Expected {len(changed)} embeddings, got {len(embeddings)}")
+        
+        metadatas = []
+        for i in changed:
+            meta = dict(metadata[i]) if metadata and i < len(metadata) and metadata[i] else {}
+            meta["content_hash"] = hashes[i]
+            metadatas.append(meta)
         
         try:
-            self.collection.add(
+            await self.store.upsert(
                 documents=texts,
                 embeddings=embeddings,
-                ids=doc_ids
+                metadatas=metadatas,
+                ids=[doc_ids[i] for i in changed]
             )
-            logger.info("Successfully added documents to ChromaDB")
         except Exception as e:
-            logger.error(f"Error adding to ChromaDB: {str(e)}")
+            logger.error(f"Error upserting to ChromaDB: {str(e)}")
             raise
+        finally:
+            self.invalidate_stats()
+        await asyncio.to_thread(self.id_index.add, [doc_ids[i] for i in changed])
+        if embeddings and embeddings[0]:
+            self._dimension = len(embeddings[0])
+        
+        return {"upserted": len(changed), "skipped": len(documents) - len(changed), "embeddings_generated": len(embeddings)}
+
+    async def add_documents_to_knowledge_base(self, documents: List[Dict[str, str]], metadata: Optional[List[Dict]] = None):
+        logger.info(f"Adding {len(documents)} documents to knowledge base")
+        
+        # Embed and upsert in batches with bounded concurrency
+        semaphore = asyncio.Semaphore(INGEST_CONCURRENCY)
+        
+        async def run_batch(start: int):
+            async with semaphore:
+                batch_metadata = metadata[start:start + INGEST_BATCH_SIZE] if metadata else None
+                return await self.upsert_documents(documents[start:start + INGEST_BATCH_SIZE], batch_metadata)
+        
+        outcomes = await asyncio.gather(*(run_batch(start) for start in range(0, len(documents), INGEST_BATCH_SIZE)))
+        await self.store.flush()
+        upserted = sum(o["upserted"] for o in outcomes)
+        skipped = sum(o["skipped"] for o in outcomes)
+        logger.info(f"Successfully upserted {upserted} documents to ChromaDB, {skipped} unchanged")
         
         return {
             "message": f"Successfully added {len(documents)} documents to ChromaDB",
             "document_count": len(documents),
-            "total_documents": len(self.list_documents()),
-            "embeddings_generated": len(embeddings)
+            "total_documents": (await self.get_stats())["count"],
+            "embeddings_generated": sum(o["embeddings_generated"] for o in outcomes),
+            "upserted": upserted,
+            "skipped_unchanged": skipped
         }
 
-    def list_documents(self):
-        results = self.collection.get()
-        return results['ids'] if results and 'ids' in results else []
+    def invalidate_stats(self):
+        self._last_modified = time.time()
+        self._stats_expires_at = 0.0
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """
+        Cheap collection stats (count, last modification, embedding model and dimension),
+        cached for COLLECTION_STATS_TTL_SECONDS. Never loads the documents themselves.
+        """
+        now = time.monotonic()
+        if self._stats is not None and now < self._stats_expires_at:
+            return self._stats
+        count = await self.store.count()
+        if self._dimension is None and count:
+            sample = await self.store.get(limit=1, include=["embeddings"])
+            embeddings = sample.get('embeddings') if sample else None
+            if embeddings is not None and len(embeddings) > 0:
+                self._dimension = len(embeddings[0])
+        self._stats = {
+            "count": count,
+            "last_modified": self._last_modified,
+            "embedding_model": EMBEDDING_MODEL,
+            "dimension": self._dimension,
+        }
+        self._stats_expires_at = now + COLLECTION_STATS_TTL_SECONDS
+        return self._stats
 
-    def search_similar_documents(self, query_embedding: List[float], top_k: int = 5):
-        logger.debug(f"Searching for similar documents with top_k={top_k}")
+    async def is_empty(self) -> bool:
+        return (await self.get_stats())["count"] == 0
+
+    async def backfill_id_index(self):
+        """
+        One-off migration at startup: index the ids of documents stored before the id index
+        existed. Only one process runs it; later starts return at once.
+        """
+        if not await asyncio.to_thread(self.id_index.claim_backfill):
+            return
+        indexed, offset = 0, 0
+        while True:
+            results = await self.store.get(limit=ID_BACKFILL_PAGE_SIZE, offset=offset, include=[])
+            ids = (results or {}).get('ids') or []
+            if not ids:
+                break
+            await asyncio.to_thread(self.id_index.add, ids)
+            indexed += len(ids)
+            offset += len(ids)
+        await asyncio.to_thread(self.id_index.mark_backfilled)
+        logger.info(f"Document id index backfilled with {indexed} existing documents")
+
+    async def list_documents(self, limit: int = DOCUMENT_LIST_DEFAULT_LIMIT, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        One page of document ids in id order. The cursor is opaque to clients; pass back
+        next_cursor to get the following page (None when there are no more). It holds the last
+        id returned, so documents added while paging are neither skipped nor repeated and each
+        page is one range read on the id index, independent of how far in it is.
+        """
+        limit = max(1, min(limit, DOCUMENT_LIST_MAX_LIMIT))
+        after = _decode_cursor(cursor)
+        # One extra id tells whether another page follows
+        ids = await asyncio.to_thread(self.id_index.page, after, limit + 1)
+        page = ids[:limit]
+        next_cursor = _encode_cursor(page[-1]) if len(ids) > limit else None
+        return {"document_ids": page, "next_cursor": next_cursor}
+
+    async def search_similar_documents(self, query_embedding: List[float], top_k: int = 5, where: Optional[Dict[str, Any]] = None):
+        results = await self.search_similar_documents_batch([query_embedding], top_k, where=where)
+        return results[0]
+
+    async def search_similar_documents_batch(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[List[Document]]:
+        """
+        Search for all query embeddings in one collection query, optionally filtered by metadata.
+        Returns one list of Documents per query embedding, in input order.
+        """
+        logger.debug(f"Searching for similar documents for {len(query_embeddings)} queries with top_k={top_k}")
         
         try:
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k
+            results = await self.store.query(
+                query_embeddings=query_embeddings,
+                n_results=top_k,
+                # Chroma rejects an empty filter
+                where=where or None
             )
             
-            similar_docs = []
             ids = results.get('ids') if results else None
             documents = results.get('documents') if results else None
             embeddings = results.get('embeddings') if results else None
+            distances = results.get('distances') if results else None
+            
+            batch = []
+            for q in range(len(query_embeddings)):
+                similar_docs = []
+                # Don't require embeddings to be present (they can be None)
+                if ids and documents and q < len(ids) and len(ids[q]) > 0:
+                    for i, doc_id in enumerate(ids[q]):
+                        # Handle case where embeddings might be None
+                        embedding = []
+                        if embeddings and embeddings[q] and i < len(embeddings[q]) and embeddings[q][i] is not None:
+                            emb = embeddings[q][i]
+                            embedding = [float(x) for x in emb] if isinstance(emb, (list, tuple)) else []
+                        
+                        doc = Document(
+                            id=doc_id,
+                            text=documents[q][i],
+                            embedding=embedding,
+                            distance=float(distances[q][i]) * self._distance_scale if distances and distances[q] else None,
+                        )
+                        similar_docs.append(doc)
+                        logger.debug(f"Found similar document: ID={doc_id}")
+                batch.append(similar_docs)
             
-            # Don't require embeddings to be present (they can be None)
-            if ids and documents and len(ids) > 0 and len(ids[0]) > 0:
-                for i, doc_id in enumerate(ids[0]):
-                    # Handle case where embeddings might be None
-                    embedding = []
-                    if embeddings and embeddings[0] and i < len(embeddings[0]) and embeddings[0][i] is not None:
-                        emb = embeddings[0][i]
-                        embedding = [float(x) for x in emb] if isinstance(emb, (list, tuple)) else []
-                    
-                    doc = Document(
-                        id=doc_id,
-                        text=documents[0][i],
-                        embedding=embedding,
-                    )
-                    similar_docs.append(doc)
-                    logger.debug(f"Found similar document: ID={doc_id}")
-            else:
+            if not any(batch):
                 logger.warning("No documents found in ChromaDB query results")
-                
-            logger.info(f"Found {len(similar_docs)} similar documents")
-            return similar_docs
+            logger.info(f"Found {sum(len(docs) for docs in batch)} similar documents for {len(batch)} queries")
+            return batch
         except Exception as e:
             logger.error(f"Error searching documents: {str(e)}")
-            return []
+            return [[] for _ in query_embeddings]
 
 document_ingestion_service = DocumentIngestionService()
\ No newline at end of file
@@ -0,0 +1,134 @@
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from app.config import (
+    REDIS_URL,
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_TTL_SECONDS,
+    EMBEDDING_CACHE_REDIS_ENABLED,
+    EMBEDDING_CACHE_REDIS_PREFIX,
+)
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier, content-addressed embedding cache keyed by hash(model, text).
+    Tier 1 is a bounded in-process LRU with TTL; tier 2 is an optional Redis shared by all workers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+        ttl: float = EMBEDDING_CACHE_TTL_SECONDS,
+        redis_enabled: bool = EMBEDDING_CACHE_REDIS_ENABLED
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._redis = None
+        self._redis_enabled = redis_enabled
+        self.hits = {"memory": 0, "redis": 0}
+        self.misses = 0
+
+    def _get_redis(self):
+        if not self._redis_enabled:
+            return None
+        if self._redis is None:
+            try:
+                import redis.asyncio as aioredis
+                self._redis = aioredis.from_url(REDIS_URL)
+            except ImportError:
+                logger.warning("redis package not installed, disabling Redis embedding cache")
+                self._redis_enabled = False
+        return self._redis
+
+    def _memory_get(self, key: str) -> Optional[List[float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, embedding = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return embedding
+
+    def _memory_set(self, key: str, embedding: List[float]):
+        self._entries[key] = (time.monotonic() + self.ttl, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up every text; returns embeddings in input order, None for misses."""
+        keys = [embedding_cache_key(model, text) for text in texts]
+        results: List[Optional[List[float]]] = [self._memory_get(key) for key in keys]
+        memory_hits = sum(1 for r in results if r is not None)
+
+        redis_hits = 0
+        pending = [i for i, r in enumerate(results) if r is None]
+        client = self._get_redis()
+        if pending and client is not None:
+            try:
+                values = await client.mget([EMBEDDING_CACHE_REDIS_PREFIX + keys[i] for i in pending])
+                for i, value in zip(pending, values):
+                    if value is not None:
+                        embedding = json.loads(value)
+                        results[i] = embedding
+                        self._memory_set(keys[i], embedding)
+                        redis_hits += 1
+            except Exception as e:
+                logger.warning(f"Redis embedding cache lookup failed: {str(e)}")
+
+        misses = len(texts) - memory_hits - redis_hits
+        self.hits["memory"] += memory_hits
+        self.hits["redis"] += redis_hits
+        self.misses += misses
+        if memory_hits:
+            metrics.inc("embedding_cache_hits_total", memory_hits, tier="memory")
+        if redis_hits:
+            metrics.inc("embedding_cache_hits_total", redis_hits, tier="redis")
+        if misses:
+            metrics.inc("embedding_cache_misses_total", misses)
+        return results
+
+    async def set_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        keys = [embedding_cache_key(model, text) for text in texts]
+        for key, embedding in zip(keys, embeddings):
+            self._memory_set(key, embedding)
+        client = self._get_redis()
+        if client is not None:
+            try:
+                async with client.pipeline(transaction=False) as pipe:
+                    for key, embedding in zip(keys, embeddings):
+                        pipe.set(EMBEDDING_CACHE_REDIS_PREFIX + key, json.dumps(embedding), ex=int(self.ttl))
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Redis embedding cache write failed: {str(e)}")
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits["memory"] + self.hits["redis"] + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "redis_enabled": self._redis_enabled,
+        }
+
+
+embedding_cache = EmbeddingCache()
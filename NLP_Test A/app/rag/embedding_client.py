@@ -1,39 +1,149 @@
-import httpx
-from app.config import USF_API_URL, EMBEDDING_HEADERS
+from app.config import (
+    USF_API_URL,
+    EMBEDDING_HEADERS,
+    EMBEDDING_MODEL,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_BATCH_ENABLED,
+    EMBEDDING_BATCH_WINDOW_MS,
+    EMBEDDING_BATCH_MAX_SIZE,
+    RERANK_MODEL,
+    RERANK_COALESCE_ENABLED,
+    RERANK_BATCH_WINDOW_MS,
+    RERANK_BATCH_MAX_SIZE,
+)
+from app.services.http_client import upstream_clients
+from app.services.micro_batcher import MicroBatcher
+from app.services.resilience import upstreams
+from app.services.singleflight import SingleFlight
+from app.services.tracing import timed
+from app.rag.embedding_cache import embedding_cache
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def get_embeddings(texts, model="usf1-embed"):
-    if isinstance(texts, str):
-        texts = [texts]
-    
+async def _request_embeddings(texts, model):
     payload = {"model": model, "input": texts}
     
     logger.debug(f"Requesting embeddings for {len(texts)} texts")
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(f"{USF_API_URL}/hiring/embed/embeddings", json=payload, headers=EMBEDDING_HEADERS)
-            
-            response_json = response.json()
-            
-            # Check if embeddings are empty
-            if 'result' in response_json and 'data' in response_json['result'] and len(response_json['result']['data']) > 0:
-                first_embedding = response_json['result']['data'][0].get('embedding', [])
-                logger.debug(f"Generated embeddings successfully, first embedding length: {len(first_embedding)}")
-            else:
-                logger.warning("No embeddings found in API response")
-            
-            return response_json
-            
-        except Exception as e:
-            logger.error(f"Error in embedding API call: {str(e)}")
-            raise
-
-async def rerank_texts(query, texts, model="usf1-rerank"):
+    async def attempt(timeout):
+        client = upstream_clients.get("embedding")
+        response = await client.post(
+            f"{USF_API_URL}/hiring/embed/embeddings",
+            json=payload,
+            headers=EMBEDDING_HEADERS,
+            timeout=upstream_clients.timeout_for("embedding", timeout)
+        )
+        response.raise_for_status()
+        return response.json()
+    
+    try:
+        # Breaker, deadline and hedging are applied by the shared upstream policy
+        with timed("embedding_api"):
+            response_json = await upstreams["embedding"].call(attempt)
+        
+        # Check if embeddings are empty
+        if 'result' in response_json and 'data' in response_json['result'] and len(response_json['result']['data']) > 0:
+            first_embedding = response_json['result']['data'][0].get('embedding', [])
+            logger.debug(f"Generated embeddings successfully, first embedding length: {len(first_embedding)}")
+        else:
+            logger.warning("No embeddings found in API response")
+        
+        return response_json
+        
+    except Exception as e:
+        logger.error(f"Error in embedding API call: {str(e)}")
+        raise
+
+async def _fetch_embeddings(model, texts):
+    """Embed texts upstream and return {text: embedding}."""
+    response_json = await _request_embeddings(texts, model)
+    data = response_json.get('result', {}).get('data', []) if isinstance(response_json, dict) else []
+    fetched = [item.get('embedding') for item in data]
+    if len(fetched) != len(texts) or not all(fetched):
+        raise ValueError(f"Embedding API returned {len(fetched)} embeddings for {len(texts)} texts")
+    return dict(zip(texts, fetched))
+
+# Concurrent single-text calls within the window go upstream as one batched request
+embedding_batcher = MicroBatcher("embedding", _fetch_embeddings, EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_BATCH_MAX_SIZE)
+
+async def _embed_uncached(texts, model):
+    if EMBEDDING_BATCH_ENABLED:
+        return await embedding_batcher.submit(model, texts)
+    by_text = await _fetch_embeddings(model, texts)
+    return [by_text[text] for text in texts]
+
+# Identical concurrent get_embeddings calls share one lookup and upstream request
+embedding_flights = SingleFlight("embedding")
+
+async def get_embeddings(texts, model=EMBEDDING_MODEL):
+    """
+    Embed one or more texts. Cached embeddings are served from the embedding cache;
+    only the misses are sent upstream (coalesced with concurrent callers), and results
+    are merged back in input order.
+    Returns the upstream response shape: {"result": {"data": [{"embedding": [...]}, ...]}}.
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+    return await embedding_flights.do((model, tuple(texts)), lambda: _get_embeddings(texts, model))
+
+async def _get_embeddings(texts, model):
+    if EMBEDDING_CACHE_ENABLED:
+        embeddings = await embedding_cache.get_many(model, texts)
+    else:
+        embeddings = [None] * len(texts)
+    # Deduplicate misses so repeated texts in one batch are embedded once
+    missing = list(dict.fromkeys(text for text, emb in zip(texts, embeddings) if emb is None))
+    
+    if missing:
+        fetched = await _embed_uncached(missing, model)
+        if EMBEDDING_CACHE_ENABLED:
+            await embedding_cache.set_many(model, missing, fetched)
+        by_text = dict(zip(missing, fetched))
+        embeddings = [emb if emb is not None else by_text[text] for text, emb in zip(texts, embeddings)]
+    
+    return {
+        "result": {
+            "data": [{"index": i, "embedding": emb} for i, emb in enumerate(embeddings)]
+        }
+    }
+
+async def _request_rerank(query, texts, model):
     payload = {"model": model, "query": query, "texts": texts}
-    async with httpx.AsyncClient() as client:
-        response = await client.post(f"{USF_API_URL}/hiring/embed/reranker", json=payload, headers=EMBEDDING_HEADERS)
-        return response.json() 
\ No newline at end of file
+
+    async def attempt(timeout):
+        client = upstream_clients.get("rerank")
+        response = await client.post(
+            f"{USF_API_URL}/hiring/embed/reranker",
+            json=payload,
+            headers=EMBEDDING_HEADERS,
+            timeout=upstream_clients.timeout_for("rerank", timeout)
+        )
+        response.raise_for_status()
+        return response.json()
+
+    with timed("rerank_api"):
+        return await upstreams["rerank"].call(attempt)
+
+async def _fetch_rerank(key, texts):
+    """Rerank texts for one (model, query) and return {text: result item}."""
+    model, query = key
+    response_json = await _request_rerank(query, texts, model)
+    items = {}
+    for item in response_json['result']['data']:
+        text = item.get('text')
+        if text is None and item.get('index') is not None:
+            text = texts[item['index']]
+            item = {**item, 'text': text}
+        items[text] = item
+    return items
+
+# The reranker scores one query per call, so only concurrent calls for the same query are merged
+rerank_batcher = MicroBatcher("rerank", _fetch_rerank, RERANK_BATCH_WINDOW_MS, RERANK_BATCH_MAX_SIZE)
+
+async def rerank_texts(query, texts, model=RERANK_MODEL):
+    if not RERANK_COALESCE_ENABLED:
+        return await _request_rerank(query, texts, model)
+    items = await rerank_batcher.submit((model, query), list(texts))
+    return {"result": {"data": [item for item in items if item is not None]}}
@@ -0,0 +1,411 @@
+import json
+import os
+import shutil
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Set
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process write lock, run a single writer there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+DEFAULT_INCLUDE = ("documents", "metadatas", "distances")
+# How often readers check whether another process wrote a newer snapshot
+RELOAD_CHECK_SECONDS = 1.0
+# Rows decoded at a time when scoring quantized matrices
+SCORE_BLOCK_ROWS = 8192
+# Snapshot versions kept on disk; older ones may still be memory-mapped by slow readers
+SNAPSHOTS_KEPT = 3
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+_RANGE_OPERATORS = {
+    "$gt": lambda a, b: a > b,
+    "$gte": lambda a, b: a >= b,
+    "$lt": lambda a, b: a < b,
+    "$lte": lambda a, b: a <= b,
+}
+
+
+def _matches(metadata: Optional[Dict[str, Any]], where: Optional[Dict[str, Any]]) -> bool:
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if isinstance(condition, dict):
+            value = metadata.get(key)
+            if "$eq" in condition and value != condition["$eq"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+            for op, compare in _RANGE_OPERATORS.items():
+                if op in condition and (value is None or not compare(value, condition[op])):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class NumpyVectorIndex:
+    """
+    In-process exact vector index with the subset of the Chroma collection API used here
+    (query, get, count, upsert, add, delete), so it can stand in for the Chroma collection.
+
+    Embeddings are L2-normalized and stored in one contiguous matrix (float32, or float16 /
+    int8 with per-row scales to save memory); top-k is a matrix product plus argpartition and
+    distances are cosine distances. flush() writes .npy snapshots that other worker processes
+    open memory-mapped, so N uvicorn workers share one page-cached copy; readers pick up new
+    snapshots automatically.
+
+    Each snapshot is a complete versioned directory, published by atomically replacing the
+    CURRENT pointer file, so a reader never mixes files from two snapshots. Any process may
+    write: flush() holds an exclusive file lock and, if another process published a newer
+    snapshot since this one loaded, replays its own pending changes on top of that snapshot.
+    """
+
+    distance_metric = "cosine"
+
+    def __init__(self, path: str, dtype: str = "float32"):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype!r}, expected one of {SUPPORTED_DTYPES}")
+        self.path = path
+        self.dtype = dtype
+        self._lock = threading.RLock()
+        self._matrix: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._size = 0
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._writable = False
+        self._dirty = False
+        self._version = 0
+        # Changes since the loaded snapshot, replayed onto a newer one written by another process
+        self._pending_upserts: Dict[str, Dict[str, Any]] = {}
+        self._pending_deletes: Set[str] = set()
+        self._last_reload_check = 0.0
+        os.makedirs(path, exist_ok=True)
+        self._load()
+
+    # Snapshot handling
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _snapshot_dir(self, version: int) -> str:
+        return self._file(os.path.join("snapshots", f"{version:010d}"))
+
+    def _current_version(self) -> int:
+        """Version named by the CURRENT pointer; 0 when there is none yet."""
+        try:
+            with open(self._file("CURRENT"), "r", encoding="utf-8") as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return 0
+
+    def _load(self):
+        version = self._current_version()
+        # Version 0 is the flat layout written before snapshots were versioned
+        directory = self._snapshot_dir(version) if version else self.path
+        meta_path = os.path.join(directory, "meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("dtype") != self.dtype:
+            logger.warning(f"Snapshot dtype {meta.get('dtype')} differs from configured {self.dtype}, requantizing on write")
+        self._matrix = self._load_array(os.path.join(directory, "embeddings.npy"))
+        scales_path = os.path.join(directory, "scales.npy")
+        self._scales = self._load_array(scales_path) if os.path.exists(scales_path) else None
+        self._ids = meta["ids"]
+        self._documents = meta["documents"]
+        self._metadatas = meta["metadatas"]
+        self._size = len(self._ids)
+        self._row_of = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._writable = False
+        self._version = version
+        logger.info(f"Loaded numpy vector snapshot v{version} with {self._size} vectors from {self.path}")
+
+    @staticmethod
+    def _load_array(path: str) -> np.ndarray:
+        try:
+            return np.load(path, mmap_mode="r")
+        except ValueError:
+            # Empty arrays cannot be memory-mapped
+            return np.load(path)
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self._dirty or now - self._last_reload_check < RELOAD_CHECK_SECONDS:
+            return
+        self._last_reload_check = now
+        if self._current_version() != self._version:
+            try:
+                self._load()
+            except FileNotFoundError:
+                # Pruned between reading CURRENT and opening it; a newer one is already published
+                self._last_reload_check = 0.0
+
+    @contextmanager
+    def _write_lock(self):
+        """Exclusive across processes sharing this index directory."""
+        if fcntl is None:
+            yield
+            return
+        with open(self._file("write.lock"), "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def flush(self):
+        """Write a snapshot if anything changed, merged with snapshots other processes wrote meanwhile."""
+        with self._lock, self._write_lock():
+            if not self._dirty:
+                return
+            published = self._current_version()
+            if published != self._version:
+                # Another process published since we loaded: start from its snapshot, redo our changes
+                upserts, deletes = self._pending_upserts, self._pending_deletes
+                self._load()
+                self._replay(upserts, deletes)
+            version = published + 1
+            directory = self._snapshot_dir(version)
+            staging = f"{directory}.tmp-{os.getpid()}"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            matrix = self._matrix[:self._size] if self._matrix is not None else np.zeros((0, 0), dtype=np.float32)
+            np.save(os.path.join(staging, "embeddings.npy"), np.ascontiguousarray(matrix))
+            if self._scales is not None:
+                np.save(os.path.join(staging, "scales.npy"), np.ascontiguousarray(self._scales[:self._size]))
+            meta = {
+                "dtype": self.dtype,
+                "ids": self._ids,
+                "documents": self._documents,
+                "metadatas": self._metadatas,
+            }
+            with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(staging, directory)
+            # Publishing is this one rename; readers see either the old or the new snapshot
+            with open(self._file("CURRENT.tmp"), "w", encoding="utf-8") as f:
+                f.write(str(version))
+            os.replace(self._file("CURRENT.tmp"), self._file("CURRENT"))
+            self._dirty = False
+            self._pending_upserts, self._pending_deletes = {}, set()
+            self._load()
+            self._prune_snapshots(version)
+
+    def _prune_snapshots(self, current: int):
+        root = self._file("snapshots")
+        for name in os.listdir(root):
+            if name.isdigit() and int(name) <= current - SNAPSHOTS_KEPT:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def _replay(self, upserts: Dict[str, Dict[str, Any]], deletes: Set[str]):
+        if deletes:
+            self._apply_delete(list(deletes))
+        # One batch per combination of given fields, since upsert() applies them all or none
+        groups: Dict[tuple, List[str]] = {}
+        for doc_id, change in upserts.items():
+            groups.setdefault(("document" in change, "metadata" in change), []).append(doc_id)
+        for (has_document, has_metadata), ids in groups.items():
+            self._apply_upsert(
+                ids,
+                np.stack([upserts[doc_id]["vector"] for doc_id in ids]),
+                [upserts[doc_id]["document"] for doc_id in ids] if has_document else None,
+                [upserts[doc_id]["metadata"] for doc_id in ids] if has_metadata else None,
+            )
+
+    # Storage helpers
+
+    def _ensure_writable(self, dim: int, extra: int):
+        """Copy a memory-mapped snapshot into a growable in-memory buffer."""
+        storage = np.int8 if self.dtype == "int8" else np.dtype(self.dtype)
+        needed = self._size + extra
+        if self._matrix is not None and self._writable and self._matrix.shape[0] >= needed:
+            return
+        capacity = max(needed, 2 * (self._matrix.shape[0] if self._matrix is not None else 0), 1024)
+        buffer = np.zeros((capacity, dim), dtype=storage)
+        scales = np.ones(capacity, dtype=np.float32) if self.dtype == "int8" else None
+        if self._matrix is not None and self._size:
+            current = self._decoded(slice(0, self._size)) if self._matrix.dtype != storage else self._matrix[:self._size]
+            if current.dtype != storage:
+                encoded, encoded_scales = self._encode(current)
+                buffer[:self._size] = encoded
+                if scales is not None:
+                    scales[:self._size] = encoded_scales
+            else:
+                buffer[:self._size] = current
+                if scales is not None and self._scales is not None:
+                    scales[:self._size] = self._scales[:self._size]
+        self._matrix, self._scales, self._writable = buffer, scales, True
+
+    def _encode(self, vectors: np.ndarray):
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(self.dtype), None
+
+    def _decoded(self, rows) -> np.ndarray:
+        block = np.asarray(self._matrix[rows], dtype=np.float32)
+        if self._scales is not None and self._matrix.dtype == np.int8:
+            block = block * np.asarray(self._scales[rows])[:, None]
+        return block
+
+    def _scores(self, queries: np.ndarray) -> np.ndarray:
+        """(queries x docs) cosine similarities, computed in row blocks to bound memory for float16/int8."""
+        if self._matrix.dtype == np.float32:
+            return queries @ self._matrix[:self._size].T
+        scores = np.empty((len(queries), self._size), dtype=np.float32)
+        for start in range(0, self._size, SCORE_BLOCK_ROWS):
+            stop = min(start + SCORE_BLOCK_ROWS, self._size)
+            scores[:, start:stop] = queries @ self._decoded(slice(start, stop)).T
+        return scores
+
+    # Collection API
+
+    def count(self) -> int:
+        with self._lock:
+            self._maybe_reload()
+            return self._size
+
+    def upsert(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]], documents: Optional[Sequence[str]] = None,
+               metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None):
+        vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            for i, doc_id in enumerate(ids):
+                change = self._pending_upserts.setdefault(doc_id, {})
+                change["vector"] = vectors[i]
+                if documents is not None:
+                    change["document"] = documents[i]
+                if metadatas is not None:
+                    change["metadata"] = metadatas[i]
+                self._pending_deletes.discard(doc_id)
+            self._apply_upsert(ids, vectors, documents, metadatas)
+
+    def _apply_upsert(self, ids: Sequence[str], vectors: np.ndarray, documents: Optional[Sequence[str]],
+                      metadatas: Optional[Sequence[Optional[Dict[str, Any]]]]):
+        encoded, scales = self._encode(vectors)
+        with self._lock:
+            new_ids = [doc_id for doc_id in dict.fromkeys(ids) if doc_id not in self._row_of]
+            self._ensure_writable(vectors.shape[1], len(new_ids))
+            for i, doc_id in enumerate(ids):
+                row = self._row_of.get(doc_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._row_of[doc_id] = row
+                    self._ids.append(doc_id)
+                    self._documents.append(None)
+                    self._metadatas.append(None)
+                self._matrix[row] = encoded[i]
+                if scales is not None:
+                    self._scales[row] = scales[i]
+                if documents is not None:
+                    self._documents[row] = documents[i]
+                if metadatas is not None:
+                    self._metadatas[row] = metadatas[i]
+            self._dirty = True
+
+    def add(self, ids, embeddings, documents=None, metadatas=None):
+        with self._lock:
+            duplicates = [doc_id for doc_id in ids if doc_id in self._row_of]
+            if duplicates:
+                raise ValueError(f"IDs already exist: {duplicates[:5]}")
+            self.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids: Sequence[str]):
+        with self._lock:
+            for doc_id in ids:
+                self._pending_upserts.pop(doc_id, None)
+                self._pending_deletes.add(doc_id)
+                # Flush even if the id is unknown here: a newer snapshot elsewhere may hold it
+                self._dirty = True
+            self._apply_delete(ids)
+
+    def _apply_delete(self, ids: Sequence[str]):
+        with self._lock:
+            doomed = {self._row_of[doc_id] for doc_id in ids if doc_id in self._row_of}
+            if not doomed:
+                return
+            keep = [row for row in range(self._size) if row not in doomed]
+            dim = self._matrix.shape[1]
+            kept_matrix = np.asarray(self._matrix[keep])
+            kept_scales = np.asarray(self._scales[keep]) if self._scales is not None else None
+            self._ids = [self._ids[row] for row in keep]
+            self._documents = [self._documents[row] for row in keep]
+            self._metadatas = [self._metadatas[row] for row in keep]
+            self._row_of = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            self._matrix, self._scales, self._size, self._writable = None, None, 0, False
+            self._ensure_writable(dim, len(keep))
+            self._matrix[:len(keep)] = kept_matrix
+            if kept_scales is not None:
+                self._scales[:len(keep)] = kept_scales
+            self._size = len(keep)
+            self._dirty = True
+
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None, include: Sequence[str] = ("documents", "metadatas")):
+        with self._lock:
+            self._maybe_reload()
+            if ids is not None:
+                rows = [self._row_of[doc_id] for doc_id in ids if doc_id in self._row_of]
+            else:
+                rows = range(self._size)
+            rows = [row for row in rows if _matches(self._metadatas[row], where)]
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+            result = {"ids": [self._ids[row] for row in rows], "documents": None, "metadatas": None, "embeddings": None}
+            if "documents" in include:
+                result["documents"] = [self._documents[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"] = [self._metadatas[row] for row in rows]
+            if "embeddings" in include:
+                result["embeddings"] = self._decoded(rows).tolist() if rows else []
+            return result
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, include: Sequence[str] = DEFAULT_INCLUDE):
+        queries = _normalize_rows(np.asarray(query_embeddings, dtype=np.float32))
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": None}
+        with self._lock:
+            self._maybe_reload()
+            if not self._size:
+                for _ in range(len(queries)):
+                    for key in ("ids", "documents", "metadatas", "distances"):
+                        result[key].append([])
+                return result
+            scores = self._scores(queries)
+            if where:
+                mask = np.array([_matches(meta, where) for meta in self._metadatas[:self._size]])
+                scores[:, ~mask] = -np.inf
+            k = min(n_results, self._size)
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            if "embeddings" in include:
+                result["embeddings"] = []
+            for q, row_candidates in enumerate(candidates):
+                order = row_candidates[np.argsort(-scores[q, row_candidates])]
+                order = [int(row) for row in order if np.isfinite(scores[q, row])]
+                result["ids"].append([self._ids[row] for row in order])
+                result["documents"].append([self._documents[row] for row in order] if "documents" in include else None)
+                result["metadatas"].append([self._metadatas[row] for row in order] if "metadatas" in include else None)
+                result["distances"].append([float(1.0 - scores[q, row]) for row in order])
+                if "embeddings" in include:
+                    result["embeddings"].append(self._decoded(order).tolist() if order else [])
+        return result
@@ -0,0 +1,67 @@
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+from app.config import RERANK_SCORE_CACHE_MAX_ENTRIES, RERANK_SCORE_CACHE_TTL_SECONDS
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def query_hash(model: str, query: str) -> str:
+    return hashlib.sha256(f"{model}\x00{query}".encode("utf-8")).hexdigest()
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class RerankScoreCache:
+    """
+    LRU + TTL cache of reranker scores keyed by (query hash, document id).
+    Each entry remembers the hash of the scored text, so a document whose content was
+    re-ingested under the same id is scored again.
+    """
+
+    def __init__(self, max_entries: int = RERANK_SCORE_CACHE_MAX_ENTRIES, ttl: float = RERANK_SCORE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, str, float]]" = OrderedDict()
+
+    def get_many(self, model: str, query: str, docs: Iterable[Tuple[str, str]]) -> Dict[str, float]:
+        """Return {doc_id: score} for the (doc_id, text) pairs that have a fresh score."""
+        qhash = query_hash(model, query)
+        now = time.monotonic()
+        scores = {}
+        misses = 0
+        for doc_id, text in docs:
+            key = (qhash, doc_id)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now or entry[1] != _text_hash(text):
+                misses += 1
+                continue
+            self._entries.move_to_end(key)
+            scores[doc_id] = entry[2]
+        if scores:
+            metrics.inc("rerank_score_cache_hits_total", len(scores))
+        if misses:
+            metrics.inc("rerank_score_cache_misses_total", misses)
+        return scores
+
+    def set_many(self, model: str, query: str, scored: Iterable[Tuple[str, str, float]]):
+        """Store (doc_id, text, score) triples."""
+        qhash = query_hash(model, query)
+        expires_at = time.monotonic() + self.ttl
+        for doc_id, text, score in scored:
+            key = (qhash, doc_id)
+            self._entries[key] = (expires_at, _text_hash(text), score)
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+rerank_score_cache = RerankScoreCache()
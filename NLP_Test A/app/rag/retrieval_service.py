@@ -1,73 +1,243 @@
+import asyncio
+import json
+import time
 import logging
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from app.rag.document_ingestion import document_ingestion_service, Document
 from app.rag.embedding_client import get_embeddings, rerank_texts
+from app.rag.rerank_cache import rerank_score_cache
+from app.services.metrics import metrics
+from app.services.tracing import timed
+from app.services.resilience import time_remaining
+from app.services.concurrency import gather_bounded
+from app.services.singleflight import SingleFlight
+from app.config import (
+    RERANK_MODEL,
+    RERANK_OVERFETCH_FACTOR,
+    RERANK_SKIP_DISTANCE_GAP,
+    RERANK_LATENCY_BUDGET_MS,
+    RAG_QUERY_RERANK_CONCURRENCY,
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Weight of the newest sample in the reranker latency moving average
+RERANK_LATENCY_SMOOTHING = 0.2
+
+
+def _ranked_result(doc: Document, source: str, rerank_score: Optional[float] = None) -> Dict[str, Any]:
+    """
+    One search result. vector_score is the cosine similarity (1 - distance) and rerank_score
+    the reranker's relevance score, None when the reranker did not score the document.
+    The two are on different scales, so score is the one that decided the rank: the rerank
+    score when source is "rerank", the vector score when it is "vector".
+    """
+    vector_score = None if doc.distance is None else 1.0 - doc.distance
+    return {
+        "id": doc.id,
+        "text": doc.text,
+        "score": rerank_score if source == "rerank" else vector_score,
+        "source": source,
+        "vector_score": vector_score,
+        "rerank_score": rerank_score,
+    }
+
+
 class RetrievalService:
     def __init__(self):
         self.document_service = document_ingestion_service
+        # Expected reranker round trip in ms; starts optimistic so the first calls are attempted
+        self.rerank_latency_ms = 0.0
+        # Identical concurrent searches share one retrieval and rerank
+        self._flights = SingleFlight("retrieval")
 
-    async def _similarity_search(self, query: str, top_k: int = 5) -> List[Document]:
+    async def _similarity_search(
+        self,
+        query: str,
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Document]:
         """
-        Search for similar documents using ChromaDB.
+        Search for similar documents using ChromaDB, optionally filtered by metadata.
+        Pass query_embedding to reuse an embedding the caller already has.
         Returns a list of Document objects.
         """
         logger.debug(f"Performing similarity search for query: '{query}' with top_k={top_k}")
         
-        # Check documents in ChromaDB instead of empty dictionary
-        doc_list = self.document_service.list_documents()
-        logger.debug(f"Available documents in ChromaDB: {doc_list}")
-        
-        if not doc_list:
+        # Cached collection stats, so the hot path never loads the whole collection
+        if await self.document_service.is_empty():
             logger.warning("No documents in ChromaDB")
             return []
             
-        logger.info("Getting query embedding...")
-        query_embedding_response = await get_embeddings(query)
-        # Extract embedding from the correct nested structure
-        query_embedding = query_embedding_response['result']['data'][0]['embedding']
+        if query_embedding is None:
+            logger.info("Getting query embedding...")
+            query_embedding_response = await get_embeddings(query)
+            # Extract embedding from the correct nested structure
+            query_embedding = query_embedding_response['result']['data'][0]['embedding']
         logger.debug(f"Query embedding generated, length: {len(query_embedding)}")
         
         logger.info("Searching in ChromaDB...")
-        similar_docs = self.document_service.search_similar_documents(query_embedding, top_k)
+        similar_docs = await self.document_service.search_similar_documents(query_embedding, top_k, where=where)
         logger.info(f"Similarity search completed, found {len(similar_docs)} documents")
         
         return similar_docs
 
-    async def _search_and_rerank(self, query: str, top_k: int = 5):
-        """
-        Search for similar documents and rerank them.
-        Returns a list of document texts (strings) only.
-        """
-        similar_docs = await self._similarity_search(query, top_k)
-        if not similar_docs:
+    def _rerank_skip_reason(self, candidates: List[Document], elapsed_ms: float, budget_ms: float) -> Optional[str]:
+        """Why the reranker should not be called for these candidates, or None to rerank."""
+        if len(candidates) < 2:
+            return "single_candidate"
+        top, runner_up = candidates[0].distance, candidates[1].distance
+        if top is not None and runner_up is not None and runner_up - top >= RERANK_SKIP_DISTANCE_GAP:
+            return "decisive_gap"
+        if elapsed_ms + self.rerank_latency_ms > budget_ms:
+            # Decay the estimate so a recovered reranker is eventually tried again
+            self.rerank_latency_ms *= 1 - RERANK_LATENCY_SMOOTHING
+            return "budget"
+        return None
+
+    async def _rerank_scores(self, query: str, candidates: List[Document], timeout: float) -> Dict[str, float]:
+        """Reranker scores by document id; cached scores are reused and only the rest is sent."""
+        scores = rerank_score_cache.get_many(RERANK_MODEL, query, ((doc.id, doc.text) for doc in candidates))
+        missing = [doc for doc in candidates if doc.id not in scores]
+        if not missing:
+            return scores
+        started = time.perf_counter()
+        try:
+            rerank_response = await asyncio.wait_for(rerank_texts(query, [doc.text for doc in missing]), timeout)
+        finally:
+            # Moving average of the reranker round trip (a timeout counts as its lower bound),
+            # used to predict whether the next call fits the budget
+            latency_ms = (time.perf_counter() - started) * 1000
+            self.rerank_latency_ms += RERANK_LATENCY_SMOOTHING * (latency_ms - self.rerank_latency_ms)
+        # Extract reranked data from the correct nested structure
+        by_text = {item['text']: item['score'] for item in rerank_response['result']['data']}
+        fresh = [(doc.id, doc.text, by_text[doc.text]) for doc in missing if doc.text in by_text]
+        rerank_score_cache.set_many(RERANK_MODEL, query, fresh)
+        scores.update((doc_id, score) for doc_id, _, score in fresh)
+        return scores
+
+    @staticmethod
+    def _effective_budget_ms(budget_ms: float) -> float:
+        remaining = time_remaining()
+        if remaining is not None:
+            # Never plan past the request deadline
+            return min(budget_ms, remaining * 1000)
+        return budget_ms
+
+    async def _rank_candidates(
+        self,
+        query: str,
+        candidates: List[Document],
+        top_k: int,
+        started: float,
+        budget_ms: float,
+    ) -> List[Dict[str, Any]]:
+        """Rerank overfetched candidates within what is left of the budget, or keep the vector order."""
+        if not candidates:
             return []
-        texts = [doc.text for doc in similar_docs]
+
+        def vector_order(outcome: str) -> List[Dict[str, Any]]:
+            metrics.inc("rerank_decisions_total", outcome=outcome)
+            return [_ranked_result(doc, "vector") for doc in candidates[:top_k]]
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        skip_reason = self._rerank_skip_reason(candidates, elapsed_ms, budget_ms)
+        if skip_reason:
+            logger.info(f"Skipping rerank ({skip_reason})")
+            return vector_order(f"skipped_{skip_reason}")
+
         logger.info("Reranking documents...")
-        rerank_response = await rerank_texts(query, texts)
-        # Extract reranked data from the correct nested structure
-        reranked_data = rerank_response['result']['data']
-        reranked_data.sort(key=lambda x: x['score'], reverse=True)
-        return [item['text'] for item in reranked_data[:top_k]]
+        try:
+            with timed("rerank"):
+                scores = await self._rerank_scores(query, candidates, timeout=(budget_ms - elapsed_ms) / 1000)
+        except asyncio.TimeoutError:
+            logger.warning(f"Rerank exceeded the {budget_ms:.0f}ms retrieval budget, using vector order")
+            return vector_order("timeout")
+        except Exception as e:
+            logger.warning(f"Rerank failed, using vector order: {str(e)}")
+            return vector_order("error")
+
+        metrics.inc("rerank_decisions_total", outcome="reranked")
+        # Candidates the reranker did not score keep their vector rank, after the scored ones
+        ranked = sorted(
+            candidates,
+            key=lambda doc: (doc.id in scores, scores.get(doc.id, 0.0)),
+            reverse=True,
+        )
+        return [_ranked_result(doc, "rerank", scores.get(doc.id)) for doc in ranked[:top_k]]
+
+    async def search_ranked(
+        self,
+        query: str,
+        top_k: int = 5,
+        query_embedding: Optional[List[float]] = None,
+        budget_ms: float = RERANK_LATENCY_BUDGET_MS,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Overfetch top_k * RERANK_OVERFETCH_FACTOR candidates, rerank them and keep top_k.
+        The reranker is skipped when the vector scores are already decisive or when it would
+        not fit in the latency budget; the vector order is used then.
+        Returns dicts with id, text, score, the ranking source ("rerank" or "vector"),
+        vector_score and rerank_score; score is whichever of the two the source names.
+        Concurrent identical searches are coalesced into one.
+        """
+        # query_embedding is derived from the query, so it is not part of the key
+        key = (query, top_k, budget_ms, json.dumps(where, sort_keys=True) if where else None)
+        return await self._flights.do(
+            key, lambda: self._search_ranked(query, top_k, query_embedding, budget_ms, where)
+        )
 
-    async def process_nlp_task_with_rag(self, task_type: str, query: str, top_k: int = 5):
+    async def _search_ranked(
+        self,
+        query: str,
+        top_k: int,
+        query_embedding: Optional[List[float]],
+        budget_ms: float,
+        where: Optional[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        budget_ms = self._effective_budget_ms(budget_ms)
+        candidates = await self._similarity_search(
+            query, top_k * RERANK_OVERFETCH_FACTOR, query_embedding=query_embedding, where=where
+        )
+        return await self._rank_candidates(query, candidates, top_k, started, budget_ms)
+
+    async def search_ranked_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+        budget_ms: float = RERANK_LATENCY_BUDGET_MS,
+        concurrency: int = RAG_QUERY_RERANK_CONCURRENCY,
+    ) -> List[List[Dict[str, Any]]]:
         """
-        Main entry: Given a query, search similar docs, rerank, and return only the text of the top result.
+        search_ranked for many queries at once: all queries are embedded in one call and
+        searched with one multi-vector collection query, then each query's candidates are
+        reranked, at most `concurrency` at a time. The latency budget applies per query,
+        from the start of its rerank step. Returns one ranked list per query, in input order.
         """
-        doc_list = self.document_service.list_documents()
-        if not doc_list:
-            logger.info("No documents in knowledge base, processing without RAG")
-            return ""
-        logger.info("Searching for relevant documents...")
-        relevant_docs = await self._search_and_rerank(query, top_k)
-        if not relevant_docs:
-            logger.info("No relevant documents found, processing without RAG")
-            return ""
-        logger.info("Returning top reranked document text...")
-        return relevant_docs[0]  
+        if not queries:
+            return []
+        if await self.document_service.is_empty():
+            logger.warning("No documents in ChromaDB")
+            return [[] for _ in queries]
+
+        embedding_response = await get_embeddings(list(queries))
+        query_embeddings = [item['embedding'] for item in embedding_response['result']['data']]
+        candidates = await self.document_service.search_similar_documents_batch(
+            query_embeddings, top_k * RERANK_OVERFETCH_FACTOR, where=where
+        )
+
+        async def rank(index: int) -> List[Dict[str, Any]]:
+            return await self._rank_candidates(
+                queries[index], candidates[index], top_k, time.perf_counter(), self._effective_budget_ms(budget_ms)
+            )
+
+        # Rerank failures already fall back to the vector order inside _rank_candidates
+        return await gather_bounded(range(len(queries)), rank, limit=concurrency, return_exceptions=False)
 
 
 retrieval_service = RetrievalService() 
\ No newline at end of file
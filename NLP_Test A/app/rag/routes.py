@@ -1,7 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from app.rag.schemas import AddDocumentsRequest, QueryRequest
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File
+from typing import Optional
+import json
+from app.rag.schemas import AddDocumentsRequest, QueryRequest, BatchQueryRequest
 from app.rag.document_ingestion import document_ingestion_service
+from app.rag.bulk_ingestion import bulk_ingestion_service, iter_lines
 from app.rag.retrieval_service import retrieval_service
+from app.rag.embedding_cache import embedding_cache
+from app.config import DOCUMENT_LIST_DEFAULT_LIMIT, BULK_UPLOAD_MAX_JSON_BYTES
 
 router = APIRouter()
 
@@ -10,9 +15,73 @@ async def add_documents_to_knowledge_base(request: AddDocumentsRequest):
     documents = [{"id": doc.id, "text": doc.text} for doc in request.documents]
     return await document_ingestion_service.add_documents_to_knowledge_base(documents)
 
+@router.post("/documents/bulk")
+async def bulk_add_documents(request: Request, job_id: Optional[str] = None):
+    """Stream NDJSON documents (one {"id", "text", "metadata"?} object per line) into the knowledge base."""
+    job = await bulk_ingestion_service.ingest(iter_lines(request.stream()), job_id)
+    return job.to_dict()
+
+@router.post("/documents/bulk/upload")
+async def bulk_upload_documents(file: UploadFile = File(...), job_id: Optional[str] = None):
+    """Ingest an uploaded NDJSON/JSONL file, or a JSON file shaped like {"documents": [...]}."""
+    if file.filename and file.filename.endswith(".json"):
+        # A JSON document has to be parsed whole, so its size is capped; NDJSON streams instead
+        body = await file.read(BULK_UPLOAD_MAX_JSON_BYTES + 1)
+        if len(body) > BULK_UPLOAD_MAX_JSON_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"JSON uploads are limited to {BULK_UPLOAD_MAX_JSON_BYTES} bytes; upload NDJSON for larger files"
+            )
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON file: {str(e)}")
+        documents = payload.get("documents") if isinstance(payload, dict) else payload
+        if not isinstance(documents, list):
+            raise HTTPException(status_code=400, detail='Expected a list of documents or {"documents": [...]}')
+        job = await bulk_ingestion_service.ingest_documents(documents, job_id)
+        return job.to_dict()
+
+    async def chunks():
+        while True:
+            chunk = await file.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+    job = await bulk_ingestion_service.ingest(iter_lines(chunks()), job_id)
+    return job.to_dict()
+
+@router.get("/documents/bulk/{job_id}")
+async def bulk_ingestion_progress(job_id: str):
+    report = await bulk_ingestion_service.get_job(job_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return report
+
 @router.get("/documents/list")
-async def list_documents():
-    doc_ids = document_ingestion_service.list_documents()
-    return {"document_ids": doc_ids}
+async def list_documents(limit: int = DOCUMENT_LIST_DEFAULT_LIMIT, cursor: Optional[str] = None):
+    try:
+        return await document_ingestion_service.list_documents(limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/query")
+async def query_knowledge_base(request: QueryRequest):
+    """Retrieve and rerank the top_k documents for one query, optionally filtered by metadata (`where`)."""
+    results = await retrieval_service.search_ranked(request.query, request.top_k, where=request.where)
+    return {"query": request.query, "results": results}
+
+@router.post("/query/batch")
+async def query_knowledge_base_batch(request: BatchQueryRequest):
+    """Many queries in one request: one embedding call, one vector query, bounded concurrent reranking."""
+    ranked = await retrieval_service.search_ranked_batch(request.queries, request.top_k, where=request.where)
+    return {"results": [{"query": query, "results": results} for query, results in zip(request.queries, ranked)]}
 
+@router.get("/documents/stats")
+async def document_stats():
+    return await document_ingestion_service.get_stats()
 
+@router.get("/embeddings/cache/stats")
+async def embedding_cache_stats():
+    return embedding_cache.stats()
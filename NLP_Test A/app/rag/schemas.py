@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from pydantic import BaseModel, Field
+from typing import Any, List, Dict, Optional
+from app.config import RAG_QUERY_BATCH_MAX_QUERIES, RAG_QUERY_MAX_TOP_K
 
 class DocumentInput(BaseModel):
     id: str
@@ -10,4 +11,12 @@ class AddDocumentsRequest(BaseModel):
 
 class QueryRequest(BaseModel):
     query: str
-    top_k: Optional[int] = 5 
\ No newline at end of file
+    top_k: int = Field(default=5, ge=1, le=RAG_QUERY_MAX_TOP_K)
+    # Metadata filter passed to the vector store, e.g. {"source": "wiki"} or {"lang": {"$in": ["en", "de"]}}
+    where: Optional[Dict[str, Any]] = None
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, max_length=RAG_QUERY_BATCH_MAX_QUERIES)
+    top_k: int = Field(default=5, ge=1, le=RAG_QUERY_MAX_TOP_K)
+    where: Optional[Dict[str, Any]] = None
+ 
\ No newline at end of file
@@ -0,0 +1,138 @@
+import asyncio
+import math
+import time
+import logging
+from typing import List, Optional
+from app.config import (
+    TOPIC_ROUTER_CONFIDENCE_MARGIN,
+    TOPIC_ROUTER_MAX_DOCUMENTS,
+    TOPIC_ROUTER_REFRESH_SECONDS,
+    TOPIC_ROUTER_RETRY_SECONDS,
+    TOPIC_ROUTER_POSITIVE_SEEDS,
+    TOPIC_ROUTER_NEGATIVE_SEEDS,
+)
+from app.rag.embedding_client import get_embeddings
+from app.rag.document_ingestion import document_ingestion_service
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+def _centroid(vectors: List[List[float]]) -> Optional[List[float]]:
+    vectors = [_normalize(v) for v in vectors if v]
+    if not vectors:
+        return None
+    dim = len(vectors[0])
+    summed = [0.0] * dim
+    for v in vectors:
+        if len(v) != dim:
+            continue
+        for i, x in enumerate(v):
+            summed[i] += x
+    return _normalize(summed)
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+class TopicRouter:
+    """
+    Decides "DL/ML/Agentic AI or not" from the query embedding alone.
+    The on-topic centroid is built from the knowledge base embeddings plus positive seeds,
+    the off-topic centroid from negative seeds. Returns None when the margin between the
+    two similarities is below the confidence threshold so the caller can fall back to the LLM.
+    If the centroids cannot be built it also returns None, and retries the build after a back-off.
+    """
+
+    def __init__(self):
+        self._positive: Optional[List[float]] = None
+        self._negative: Optional[List[float]] = None
+        self._built_at = 0.0
+        self._failed_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def _load_document_embeddings(self) -> List[List[float]]:
+        try:
+            results = await document_ingestion_service.store.get(
+                limit=TOPIC_ROUTER_MAX_DOCUMENTS,
+                include=["embeddings"]
+            )
+            embeddings = results.get('embeddings') if results else None
+            return [list(e) for e in embeddings] if embeddings is not None else []
+        except Exception as e:
+            logger.warning(f"Could not load document embeddings for topic router: {str(e)}")
+            return []
+
+    async def _build(self):
+        seeds = TOPIC_ROUTER_POSITIVE_SEEDS + TOPIC_ROUTER_NEGATIVE_SEEDS
+        response = await get_embeddings(seeds)
+        seed_embeddings = [item['embedding'] for item in response['result']['data']]
+        positive_seeds = seed_embeddings[:len(TOPIC_ROUTER_POSITIVE_SEEDS)]
+        negative_seeds = seed_embeddings[len(TOPIC_ROUTER_POSITIVE_SEEDS):]
+
+        document_embeddings = await self._load_document_embeddings()
+        self._positive = _centroid(positive_seeds + document_embeddings)
+        self._negative = _centroid(negative_seeds)
+        self._built_at = time.monotonic()
+        self._failed_at = None
+        logger.info(
+            f"Topic router built from {len(positive_seeds)} positive seeds, "
+            f"{len(document_embeddings)} documents and {len(negative_seeds)} negative seeds"
+        )
+
+    def _needs_build(self) -> bool:
+        now = time.monotonic()
+        if self._failed_at is not None and now - self._failed_at < TOPIC_ROUTER_RETRY_SECONDS:
+            return False
+        return self._positive is None or now - self._built_at >= TOPIC_ROUTER_REFRESH_SECONDS
+
+    async def _ensure_built(self):
+        """Build or refresh the centroids when due. Never raises; a failed build keeps any old centroids."""
+        if not self._needs_build():
+            return
+        async with self._lock:
+            if not self._needs_build():
+                return
+            try:
+                await self._build()
+            except Exception as e:
+                self._failed_at = time.monotonic()
+                logger.warning(
+                    f"Topic router build failed, retrying in {TOPIC_ROUTER_RETRY_SECONDS}s: {str(e)}"
+                )
+
+    def invalidate(self):
+        """Force a rebuild on next use, e.g. after the knowledge base changed."""
+        self._built_at = 0.0
+        self._failed_at = None
+
+    async def classify_embedding(self, embedding: List[float]) -> Optional[bool]:
+        await self._ensure_built()
+        if self._positive is None or self._negative is None or not embedding:
+            return None
+        query = _normalize(embedding)
+        margin = _cosine(query, self._positive) - _cosine(query, self._negative)
+        logger.debug(f"Topic router margin: {margin:.4f}")
+        if margin >= TOPIC_ROUTER_CONFIDENCE_MARGIN:
+            return True
+        if margin <= -TOPIC_ROUTER_CONFIDENCE_MARGIN:
+            return False
+        return None
+
+    async def classify(self, text: str) -> Optional[bool]:
+        """True/False when confident, None when the LLM should decide."""
+        try:
+            response = await get_embeddings(text)
+            embedding = response['result']['data'][0]['embedding']
+            return await self.classify_embedding(embedding)
+        except Exception as e:
+            logger.warning(f"Topic router failed, deferring to LLM: {str(e)}")
+            return None
+
+
+topic_router = TopicRouter()
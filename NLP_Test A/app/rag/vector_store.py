@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from app.config import (
+    VECTOR_STORE_READ_WORKERS,
+    VECTOR_STORE_WRITE_WORKERS,
+    VECTOR_STORE_BACKEND,
+    CHROMA_PATH,
+    VECTOR_STORE_NUMPY_PATH,
+    VECTOR_STORE_NUMPY_DTYPE,
+)
+from app.services.metrics import metrics
+from app.services.tracing import record_stage
+
+logger = logging.getLogger(__name__)
+
+
+def open_collection(backend: str = VECTOR_STORE_BACKEND, name: str = "documents"):
+    """
+    Open the configured vector backend. Both expose the same collection interface
+    (query, get, count, upsert, add, delete) and new collections use cosine distance.
+    """
+    if backend == "numpy":
+        from app.rag.numpy_index import NumpyVectorIndex
+        return NumpyVectorIndex(f"{VECTOR_STORE_NUMPY_PATH}/{name}", dtype=VECTOR_STORE_NUMPY_DTYPE)
+    if backend == "chroma":
+        import chromadb
+        client = chromadb.PersistentClient(path=CHROMA_PATH)
+        collection = client.get_or_create_collection(name, metadata={"hnsw:space": "cosine"})
+        if distance_metric(collection) != "cosine":
+            # The space of an existing collection cannot change; re-ingest to switch to cosine
+            logger.warning(
+                f"Chroma collection '{name}' uses {distance_metric(collection)} distance; "
+                "distances are converted assuming unit-length embeddings"
+            )
+        return collection
+    raise ValueError(f"Unknown vector store backend: {backend}")
+
+
+def distance_metric(collection) -> str:
+    """Distance space of an open collection: "cosine", "l2" (squared) or "ip"."""
+    metric = getattr(collection, "distance_metric", None)
+    if metric:
+        return metric
+    return (getattr(collection, "metadata", None) or {}).get("hnsw:space", "l2")
+
+
+def cosine_distance_scale(collection) -> float:
+    """
+    Factor turning the collection's distances into cosine distances. For unit-length
+    embeddings squared L2 is 2 * cosine distance and inner-product distance equals it.
+    """
+    return 0.5 if distance_metric(collection) == "l2" else 1.0
+
+
+class AsyncVectorStore:
+    """
+    Async facade over a synchronous, disk-backed vector collection (Chroma or the NumPy index).
+    Reads and writes run on separate thread pools so a large ingest cannot starve
+    queries, and neither blocks the event loop. Reports queue depth and wait time per pool.
+    """
+
+    def __init__(
+        self,
+        collection,
+        read_workers: int = VECTOR_STORE_READ_WORKERS,
+        write_workers: int = VECTOR_STORE_WRITE_WORKERS
+    ):
+        self.collection = collection
+        self._pools = {
+            "read": ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="vector-read"),
+            "write": ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix="vector-write"),
+        }
+        self._queued: Dict[str, int] = {"read": 0, "write": 0}
+        self._lock = threading.Lock()
+
+    def _adjust_queue(self, pool: str, delta: int):
+        with self._lock:
+            self._queued[pool] += delta
+            depth = self._queued[pool]
+        metrics.set_gauge("vector_store_queue_depth", depth, pool=pool)
+
+    def _dequeue_once(self, pool: str, state: Dict[str, bool]) -> bool:
+        # Either the worker thread or a cancellation removes the job from the queue, never both
+        with self._lock:
+            if state["dequeued"]:
+                return False
+            state["dequeued"] = True
+        self._adjust_queue(pool, -1)
+        return True
+
+    async def _run(self, pool: str, operation: str, func: Callable[..., Any], *args, **kwargs):
+        submitted = time.perf_counter()
+        state = {"dequeued": False}
+        self._adjust_queue(pool, 1)
+
+        def call():
+            started = time.perf_counter()
+            self._dequeue_once(pool, state)
+            metrics.observe("vector_store_queue_wait_seconds", started - submitted, pool=pool)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe("vector_store_operation_seconds", time.perf_counter() - started, operation=operation)
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pools[pool], call)
+        except asyncio.CancelledError:
+            self._dequeue_once(pool, state)
+            raise
+        finally:
+            # Queue wait included, as seen by the request
+            record_stage(f"vector_{operation}", time.perf_counter() - submitted)
+
+    async def query(self, **kwargs):
+        return await self._run("read", "query", self.collection.query, **kwargs)
+
+    async def get(self, **kwargs):
+        return await self._run("read", "get", self.collection.get, **kwargs)
+
+    async def count(self) -> int:
+        return await self._run("read", "count", self.collection.count)
+
+    async def upsert(self, **kwargs):
+        return await self._run("write", "upsert", self.collection.upsert, **kwargs)
+
+    async def add(self, **kwargs):
+        return await self._run("write", "add", self.collection.add, **kwargs)
+
+    async def delete(self, **kwargs):
+        return await self._run("write", "delete", self.collection.delete, **kwargs)
+
+    async def flush(self):
+        """Persist pending writes for backends that snapshot (no-op for Chroma)."""
+        flush = getattr(self.collection, "flush", None)
+        if flush is not None:
+            await self._run("write", "flush", flush)
+
+    def queue_depths(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._queued)
+
+    def shutdown(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=True)
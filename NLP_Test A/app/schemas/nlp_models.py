@@ -1,13 +1,50 @@
-from pydantic import BaseModel, HttpUrl
-from typing import Union, Optional, List
+from pydantic import BaseModel, Field, HttpUrl, field_validator
+from typing import Any, Dict, Literal, Union, Optional, List
+
+TaskType = Literal["classify", "entities", "summarize", "sentiment"]
 
 class FlexibleTextRequest(BaseModel):
     text: Optional[Union[str, List[str]]] = None
     webhook_url: Optional[HttpUrl] = None
     task_id: Optional[str] = None
+    # Include the executed per-request plan in the response
+    debug: Optional[bool] = False
+
+class AnalyzeRequest(FlexibleTextRequest):
+    # Tasks answered together for each text, in one structured LLM call
+    tasks: List[TaskType] = Field(default=["classify", "entities", "summarize", "sentiment"], min_length=1)
+
+    @field_validator("tasks")
+    @classmethod
+    def dedupe_tasks(cls, tasks: List[str]) -> List[str]:
+        return list(dict.fromkeys(tasks))
+
+class TaskAnalysis(BaseModel):
+    """One field per task, as returned by the multi-task prompt. Empty answers count as missing."""
+    classify: Optional[str] = None
+    entities: Optional[str] = None
+    summarize: Optional[str] = None
+    sentiment: Optional[str] = None
+
+    @field_validator("entities", mode="before")
+    @classmethod
+    def entities_as_table(cls, value: Any) -> Any:
+        # Models often answer with a list of {"entity", "type"} objects instead of the table
+        if isinstance(value, list) and all(isinstance(item, dict) for item in value):
+            rows = [f"{item.get('entity', item.get('Entity', ''))} | {item.get('type', item.get('Type', ''))}" for item in value]
+            return "\n".join(["Entity | Type", *rows])
+        return value
+
+    @field_validator("classify", "entities", "summarize", "sentiment")
+    @classmethod
+    def strip_empty(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        value = value.strip()
+        return value or None
 
 class WebhookNotification(BaseModel):
     task_id: str
-    status: str 
-    result: Optional[Union[str, List[str]]] = None
+    status: str
+    result: Optional[Union[str, Dict[str, str], List[Union[str, Dict[str, str]]]]] = None
     error: Optional[str] = None
@@ -0,0 +1,244 @@
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+from app.config import (
+    ADMISSION_ENABLED,
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_QUEUE_MAX,
+    ADMISSION_PRIORITIES,
+    ADMISSION_BATCH_PATHS,
+    ADMISSION_MAX_WAIT_SECONDS,
+)
+from app.services.metrics import metrics
+from app.services.tracing import record_stage
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the service-time moving average used to estimate queue waits
+SERVICE_TIME_SMOOTHING = 0.1
+PRIORITY_HEADER = b"x-request-priority"
+
+
+class AdmissionRejected(Exception):
+    """The request was shed instead of queued; retry after `retry_after` seconds."""
+
+    def __init__(self, priority: str, reason: str, retry_after: float):
+        super().__init__(f"Server overloaded ({reason}), retry in {math.ceil(retry_after)}s")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def status_code(self) -> int:
+        # Interactive callers hit a server-side limit; batch callers are asked to slow down
+        return 503 if self.priority == ADMISSION_PRIORITIES[0] else 429
+
+
+class _Waiter:
+    __slots__ = ("rank", "priority", "future", "enqueued_at")
+
+    def __init__(self, rank: int, priority: str, future: asyncio.Future):
+        self.rank = rank
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class AdmissionController:
+    """
+    Admission control in front of the request handlers: at most `max_concurrent` requests
+    run at once and the rest wait in a queue ordered by priority, then arrival. A request
+    is shed right away when its expected wait is longer than its priority allows, and
+    later if it actually waits that long. When the queue is full, an arrival displaces the
+    lowest-priority waiter behind it, or is shed itself. Priorities whose max wait is None
+    are never shed and do not count against the queue bound.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        queue_max: int = ADMISSION_QUEUE_MAX,
+        priorities: List[str] = ADMISSION_PRIORITIES,
+        max_wait: Dict[str, Optional[float]] = ADMISSION_MAX_WAIT_SECONDS,
+        enabled: bool = ADMISSION_ENABLED,
+    ):
+        self.max_concurrent = max_concurrent
+        self.queue_max = queue_max
+        self.priorities = list(priorities)
+        self.max_wait = max_wait
+        self.enabled = enabled
+        self.in_flight = 0
+        # Mean time a request holds its slot; starts at zero so nothing is shed before there is data
+        self.service_seconds = 0.0
+        self._heap: List[tuple] = []
+        self._order = itertools.count()
+        self._queued: Dict[str, int] = {priority: 0 for priority in self.priorities}
+
+    def _publish(self):
+        metrics.set_gauge("admission_in_flight", self.in_flight)
+        for priority, count in self._queued.items():
+            metrics.set_gauge("admission_queue_length", count, priority=priority)
+
+    def _sheddable(self, priority: str) -> bool:
+        return self.max_wait.get(priority) is not None
+
+    def _waiting(self) -> int:
+        # Cancelled and displaced waiters stay in the heap until popped, so count live ones
+        return sum(self._queued.values())
+
+    def queue_length(self, priority: Optional[str] = None) -> int:
+        if priority is not None:
+            return self._queued[priority]
+        return sum(count for priority, count in self._queued.items() if self._sheddable(priority))
+
+    def estimated_wait(self, rank: int) -> float:
+        """Expected queueing time for a new request of this rank; a slot frees up every service_seconds / max_concurrent."""
+        if self.in_flight < self.max_concurrent and not self._waiting():
+            return 0.0
+        ahead = sum(self._queued[priority] for priority in self.priorities[:rank + 1])
+        return (ahead + 1) * self.service_seconds / self.max_concurrent
+
+    def _shed(self, priority: str, reason: str, retry_after: float) -> AdmissionRejected:
+        metrics.inc("admission_shed_total", priority=priority, reason=reason)
+        logger.warning(f"Shedding {priority} request ({reason})")
+        return AdmissionRejected(priority, reason, max(1.0, retry_after))
+
+    def _displace(self, rank: int) -> bool:
+        """Shed the lowest-priority sheddable waiter ranked below `rank`; False if there is none."""
+        victims = [w for _, _, w in self._heap if w.rank > rank and not w.future.done() and self._sheddable(w.priority)]
+        if not victims:
+            return False
+        victim = max(victims, key=lambda w: (w.rank, w.enqueued_at))
+        victim.future.set_exception(self._shed(victim.priority, "displaced", self.estimated_wait(victim.rank)))
+        self._queued[victim.priority] -= 1
+        return True
+
+    def _take(self):
+        self.in_flight += 1
+        self._publish()
+
+    def _hand_off(self):
+        """Give a free slot to the next live waiter, highest priority first."""
+        while self._heap and self.in_flight < self.max_concurrent:
+            _, _, waiter = heapq.heappop(self._heap)
+            if waiter.future.done():
+                continue
+            self._queued[waiter.priority] -= 1
+            self.in_flight += 1
+            waiter.future.set_result(None)
+        self._publish()
+
+    async def acquire(self, priority: str):
+        rank = self.priorities.index(priority)
+        if self.in_flight < self.max_concurrent and not self._waiting():
+            self._take()
+            return
+
+        max_wait = self.max_wait.get(priority)
+        if max_wait is not None:
+            estimate = self.estimated_wait(rank)
+            if estimate > max_wait:
+                raise self._shed(priority, "estimated_wait", estimate)
+            if self.queue_length() >= self.queue_max and not self._displace(rank):
+                raise self._shed(priority, "queue_full", estimate)
+
+        waiter = _Waiter(rank, priority, asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, (rank, next(self._order), waiter))
+        self._queued[priority] += 1
+        # A slot may already be free (e.g. only stale waiters were queued)
+        self._hand_off()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # Admitted just as we gave up; pass the slot on
+                self.in_flight -= 1
+                self._hand_off()
+            elif not waiter.future.done():
+                waiter.future.cancel()
+                self._queued[priority] -= 1
+                self._publish()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._shed(priority, "timeout", self.estimated_wait(rank))
+        finally:
+            metrics.observe("admission_queue_wait_seconds", time.perf_counter() - waiter.enqueued_at, priority=priority)
+
+    def release(self, held_seconds: float):
+        self.service_seconds += SERVICE_TIME_SMOOTHING * (held_seconds - self.service_seconds)
+        self.in_flight -= 1
+        self._hand_off()
+
+    @asynccontextmanager
+    async def admit(self, priority: str):
+        """Hold an execution slot for the enclosed work; raises AdmissionRejected when shed."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            await self.acquire(priority)
+        finally:
+            record_stage("admission_queue", time.perf_counter() - started)
+        metrics.inc("admission_admitted_total", priority=priority)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+
+admission = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that puts POST /nlp/* and /rag/* requests through the admission queue
+    for as long as they run (streamed bodies included). Batch paths get "batch" priority;
+    a client can lower its own priority with an X-Request-Priority header, never raise it.
+    Shed requests get 503 (interactive) or 429 (batch) with Retry-After.
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission):
+        self.app = app
+        self.controller = controller
+
+    def _priority(self, scope) -> Optional[str]:
+        if scope["type"] != "http" or scope.get("method") != "POST":
+            return None
+        path = scope.get("path", "")
+        if not path.startswith(("/nlp/", "/rag/")):
+            return None
+        priorities = self.controller.priorities
+        rank = 1 if any(path.startswith(batch_path) for batch_path in ADMISSION_BATCH_PATHS) else 0
+        requested = dict(scope.get("headers") or []).get(PRIORITY_HEADER)
+        if requested:
+            name = requested.decode("latin-1").strip().lower()
+            if name in priorities:
+                rank = max(rank, priorities.index(name))
+        return priorities[rank]
+
+    async def __call__(self, scope, receive, send):
+        priority = self._priority(scope) if self.controller.enabled else None
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            async with self.controller.admit(priority):
+                await self.app(scope, receive, send)
+        except AdmissionRejected as e:
+            await send({
+                "type": "http.response.start",
+                "status": e.status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", str(math.ceil(e.retry_after)).encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": json.dumps({"detail": str(e)}).encode("utf-8")})
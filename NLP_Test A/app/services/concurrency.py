@@ -0,0 +1,23 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+from app.config import BATCH_CONCURRENCY_LIMIT
+
+
+async def gather_bounded(
+    items: Iterable[Any],
+    func: Callable[[Any], Awaitable[Any]],
+    limit: Optional[int] = None,
+    return_exceptions: bool = True
+) -> List[Any]:
+    """
+    Run func over items concurrently, at most `limit` at a time.
+    Results keep the input order. With return_exceptions, a failing item returns its
+    exception in place instead of cancelling its siblings.
+    """
+    semaphore = asyncio.Semaphore(limit or BATCH_CONCURRENCY_LIMIT)
+
+    async def run_one(item):
+        async with semaphore:
+            return await func(item)
+
+    return await asyncio.gather(*(run_one(item) for item in items), return_exceptions=return_exceptions)
@@ -0,0 +1,115 @@
+import math
+import re
+import logging
+from typing import Any, Dict, List, Sequence, Set, Union
+from app.config import CONTEXT_TOKEN_BUDGET, CONTEXT_MIN_PASSAGE_TOKENS, CONTEXT_DEDUP_OVERLAP
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Passage = Union[str, Dict[str, Any]]
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_SHINGLE_SIZE = 5
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    # Optional: without tiktoken the estimate below is used
+    _encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count of text: exact with tiktoken when installed, otherwise a local BPE-like
+    estimate (one token per punctuation mark, one per ~4 characters of each word).
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _PIECE_RE.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, preferring to end on a sentence boundary."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    low, high = 0, len(words)
+    # Binary search for the longest word prefix that fits
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(" ".join(words[:mid])) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    cut = " ".join(words[:low])
+    sentence_end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if sentence_end > len(cut) // 2:
+        return cut[:sentence_end + 1]
+    return cut + " ..." if cut else ""
+
+
+def _shingles(text: str) -> Set[tuple]:
+    words = [w.lower() for w in re.findall(r"\w+", text)]
+    if len(words) < _SHINGLE_SIZE:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + _SHINGLE_SIZE]) for i in range(len(words) - _SHINGLE_SIZE + 1)}
+
+
+def _overlaps(a: Set[tuple], b: Set[tuple], threshold: float) -> bool:
+    if not a or not b:
+        return False
+    return len(a & b) / min(len(a), len(b)) >= threshold
+
+
+def _as_dict(passage: Passage, rank: int) -> Dict[str, Any]:
+    if isinstance(passage, str):
+        return {"text": passage, "score": None, "rank": rank}
+    return {**passage, "rank": rank}
+
+
+def pack_context(
+    passages: Sequence[Passage],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    dedup_overlap: float = CONTEXT_DEDUP_OVERLAP,
+) -> str:
+    """
+    Assemble retrieved passages (texts, or dicts with "text" and "score") into a context
+    block of at most `budget` tokens. The best-scored passages go first. A passage that
+    mostly repeats a better one is dropped. When the budget runs out, the next passage is
+    truncated if enough room is left, and everything after it is dropped.
+    """
+    ranked: List[Dict[str, Any]] = [_as_dict(passage, rank) for rank, passage in enumerate(passages) if passage]
+    # Highest score first; unscored passages keep their retrieval order after the scored ones
+    ranked.sort(key=lambda p: (p.get("score") is None, -(p.get("score") or 0.0), p["rank"]))
+
+    kept: List[str] = []
+    kept_shingles: List[Set[tuple]] = []
+    used = 0
+    outcome = {"kept": 0, "duplicate": 0, "truncated": 0, "dropped": 0}
+    for index, passage in enumerate(ranked):
+        text = passage["text"].strip()
+        shingles = _shingles(text)
+        if any(_overlaps(shingles, other, dedup_overlap) for other in kept_shingles):
+            outcome["duplicate"] += 1
+            continue
+        # Separator between passages costs a token or two
+        cost = estimate_tokens(text) + (2 if kept else 0)
+        if used + cost <= budget:
+            kept.append(text)
+            kept_shingles.append(shingles)
+            used += cost
+            outcome["kept"] += 1
+            continue
+        room = budget - used - (2 if kept else 0)
+        if room >= CONTEXT_MIN_PASSAGE_TOKENS:
+            kept.append(truncate_to_tokens(text, room))
+            outcome["truncated"] += 1
+        outcome["dropped"] += len(ranked) - index - (1 if room >= CONTEXT_MIN_PASSAGE_TOKENS else 0)
+        break
+
+    for name, count in outcome.items():
+        if count:
+            metrics.inc("context_passages_total", count, outcome=name)
+    return "\n\n".join(kept)
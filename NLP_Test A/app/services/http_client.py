@@ -0,0 +1,87 @@
+import httpx
+import logging
+from typing import Dict, Optional
+from app.config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2_ENABLED,
+    HTTP_CONNECT_TIMEOUT,
+    LLM_TIMEOUT,
+    EMBEDDING_TIMEOUT,
+    RERANK_TIMEOUT,
+    WEBHOOK_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Default read/write timeout for each upstream the service talks to
+UPSTREAM_TIMEOUTS = {
+    "llm": LLM_TIMEOUT,
+    "embedding": EMBEDDING_TIMEOUT,
+    "rerank": RERANK_TIMEOUT,
+    "webhook": WEBHOOK_TIMEOUT,
+}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class UpstreamClients:
+    """
+    Long-lived, pooled httpx clients, one per upstream.
+    Started and closed through the FastAPI lifespan; created lazily when used outside of it.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._http2 = HTTP2_ENABLED and _http2_available()
+        if HTTP2_ENABLED and not self._http2:
+            logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed, using HTTP/1.1")
+
+    def _build_client(self, name: str) -> httpx.AsyncClient:
+        timeout = UPSTREAM_TIMEOUTS.get(name, LLM_TIMEOUT)
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=HTTP_CONNECT_TIMEOUT),
+            limits=limits,
+            http2=self._http2,
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Return the shared client for an upstream, creating it on first use."""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._build_client(name)
+            self._clients[name] = client
+        return client
+
+    def timeout_for(self, name: str, timeout: Optional[float] = None) -> httpx.Timeout:
+        """Per-request timeout override that keeps the pool's connect timeout."""
+        return httpx.Timeout(timeout or UPSTREAM_TIMEOUTS.get(name, LLM_TIMEOUT), connect=HTTP_CONNECT_TIMEOUT)
+
+    async def start(self):
+        for name in UPSTREAM_TIMEOUTS:
+            self.get(name)
+        logger.info(f"Started upstream HTTP clients (http2={self._http2})")
+
+    async def close(self):
+        for name, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing {name} HTTP client: {str(e)}")
+        self._clients.clear()
+        logger.info("Closed upstream HTTP clients")
+
+
+upstream_clients = UpstreamClients()
@@ -0,0 +1,79 @@
+import asyncio
+import uuid
+import logging
+from typing import Any, Dict
+from app.config import JOB_QUEUE_BACKEND
+from app.schemas.nlp_models import FlexibleTextRequest, AnalyzeRequest
+from app.services.nlp_pipeline import execute_request, ANALYZE_TASK
+from app.services.task_store import task_store
+from app.services.webhook_service import webhook_service
+from app.services.admission import admission
+
+logger = logging.getLogger(__name__)
+
+
+async def run_job(task_type: str, request_data: Dict[str, Any], task_id: str):
+    """Execute one queued NLP request, recording its status and notifying the webhook."""
+    request_model = AnalyzeRequest if task_type == ANALYZE_TASK else FlexibleTextRequest
+    req = request_model(**request_data)
+    webhook_url = str(req.webhook_url) if req.webhook_url else None
+    await task_store.set(task_id, "processing", task_type=task_type)
+    if webhook_url:
+        await webhook_service.send_processing_notification(webhook_url, task_id)
+    try:
+        # Queued jobs run behind interactive requests and are never shed
+        async with admission.admit("background"):
+            results, plan = await execute_request(req, task_type)
+    except Exception as e:
+        logger.error(f"Task {task_id} failed: {str(e)}")
+        await task_store.set(task_id, "failed", task_type=task_type, error=str(e))
+        if webhook_url:
+            await webhook_service.send_error_notification(webhook_url, task_id, str(e))
+        return
+
+    extra = {"plan": plan.describe()} if req.debug else {}
+    await task_store.set(task_id, "completed", task_type=task_type, result=results, **extra)
+    if webhook_url:
+        await webhook_service.send_completion_notification(webhook_url, task_id, results)
+
+
+class JobQueue:
+    """
+    Hands webhook-mode requests to the worker pool.
+    The "celery" backend publishes to the broker; the "local" backend runs jobs as
+    asyncio tasks in the API process, a stand-in for tests and single-process setups.
+    """
+
+    def __init__(self, backend: str = JOB_QUEUE_BACKEND):
+        self.backend = backend
+        self._local_jobs = set()
+
+    async def enqueue(self, req: FlexibleTextRequest, task_type: str) -> str:
+        task_id = req.task_id or str(uuid.uuid4())
+        request_data = req.model_dump(mode="json")
+        request_data["task_id"] = task_id
+        await task_store.set(task_id, "queued", task_type=task_type)
+
+        if self.backend == "local":
+            job = asyncio.create_task(run_job(task_type, request_data, task_id))
+            self._local_jobs.add(job)
+            job.add_done_callback(self._local_jobs.discard)
+        else:
+            from app.worker import run_nlp_task
+            # Publishing talks to the broker synchronously, so keep it off the event loop
+            try:
+                await asyncio.to_thread(
+                    run_nlp_task.apply_async,
+                    args=[task_type, request_data, task_id],
+                    task_id=task_id
+                )
+            except Exception as e:
+                # No worker will ever pick this task up; don't leave it "queued" forever
+                logger.error(f"Could not queue task {task_id}: {str(e)}")
+                await task_store.set(task_id, "failed", task_type=task_type, error=f"Could not queue task: {str(e)}")
+                raise
+        logger.info(f"Queued {task_type} task {task_id} ({self.backend})")
+        return task_id
+
+
+job_queue = JobQueue()
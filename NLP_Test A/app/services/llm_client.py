@@ -1,20 +1,107 @@
+import asyncio
 import httpx
+import json
+import math
+import time
+from typing import AsyncIterator, Optional
 from fastapi import HTTPException
 from app.config import LLM_API_URL, LLM_HEADERS
+from app.services.http_client import upstream_clients
+from app.services.metrics import metrics
+from app.services.tracing import timed
+from app.services.resilience import upstreams, time_remaining, DeadlineExceeded, UpstreamUnavailable
 
-async def call_llm_api(payload, timeout: float = 30.0):
+def _as_http_error(e: Exception) -> HTTPException:
+    """Map an LLM call failure to the HTTPException the API returns."""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, UpstreamUnavailable):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    if isinstance(e, DeadlineExceeded) or (isinstance(e, (httpx.TimeoutException, asyncio.TimeoutError)) and time_remaining() == 0):
+        return HTTPException(status_code=504, detail="Request deadline exceeded")
+    if isinstance(e, (httpx.TimeoutException, asyncio.TimeoutError)):
+        return HTTPException(status_code=408, detail="LLM API request timed out")
+    if isinstance(e, httpx.RequestError):
+        return HTTPException(status_code=500, detail=f"LLM API request failed: {str(e)}")
+    return HTTPException(status_code=500, detail=f"LLM API error: {str(e)}")
+
+async def _post_completion(payload, timeout: Optional[float]):
+    client = upstream_clients.get("llm")
+    response = await client.post(
+        LLM_API_URL,
+        json=payload,
+        headers=LLM_HEADERS,
+        timeout=upstream_clients.timeout_for("llm", timeout)
+    )
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail="LLM API error")
+    return response.json()['choices'][0]['message']['content']
+
+async def call_llm_api(payload, timeout: Optional[float] = None):
     """
     Call LLM API with configurable timeout and better error handling.
+    Uses the shared, pooled LLM client so connections are reused across calls, behind the
+    LLM circuit breaker and capped by the request deadline.
+    """
+    try:
+        with timed("llm"):
+            return await upstreams["llm"].call(lambda attempt_timeout: _post_completion(payload, attempt_timeout), timeout)
+    except Exception as e:
+        raise _as_http_error(e)
+
+async def stream_llm_api(payload, timeout: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Call LLM API in streaming mode and yield content deltas as they arrive.
+    Expects OpenAI-style server-sent events ("data: {...}" lines ending with "data: [DONE]").
     """
+    payload = {**payload, "stream": True}
+    upstream = upstreams["llm"]
+    started = time.perf_counter()
+    first_token = True
+    acquired = False
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(LLM_API_URL, json=payload, headers=LLM_HEADERS)
+        # Deadline first: an expired request must not take a half-open trial or count as a failure
+        timeout = upstream.timeout(timeout)
+        upstream.check()
+        # The limiter slot is held until the stream ends
+        timeout = await upstream.acquire(timeout)
+        acquired = True
+        client = upstream_clients.get("llm")
+        async with client.stream(
+            "POST",
+            LLM_API_URL,
+            json=payload,
+            headers=LLM_HEADERS,
+            timeout=upstream_clients.timeout_for("llm", timeout)
+        ) as response:
             if response.status_code != 200:
                 raise HTTPException(status_code=500, detail="LLM API error")
-            return response.json()['choices'][0]['message']['content']
-    except httpx.TimeoutException:
-        raise HTTPException(status_code=408, detail="LLM API request timed out")
-    except httpx.RequestError as e:
-        raise HTTPException(status_code=500, detail=f"LLM API request failed: {str(e)}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                choice = (chunk.get("choices") or [{}])[0]
+                # Some upstreams send the full message instead of a delta on the last chunk
+                content = (choice.get("delta") or choice.get("message") or {}).get("content")
+                if content:
+                    if first_token:
+                        metrics.observe("llm_time_to_first_token_seconds", time.perf_counter() - started)
+                        first_token = False
+                    yield content
+    except (UpstreamUnavailable, DeadlineExceeded) as e:
+        raise _as_http_error(e)
+    except (asyncio.CancelledError, GeneratorExit):
+        # The client went away mid-stream; that says nothing about the upstream's health
+        upstream.breaker.release_trial()
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"LLM API error: {str(e)}")
+        upstream.record(False)
+        raise _as_http_error(e)
+    finally:
+        if acquired:
+            upstream.release()
+    # Stream durations are not comparable to completion latencies, so only health is recorded
+    upstream.record(True)
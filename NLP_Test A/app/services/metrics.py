@@ -0,0 +1,163 @@
+import bisect
+import os
+import threading
+from typing import Dict, List, Tuple
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def process_metrics() -> Dict[str, float]:
+    """CPU, memory and thread stats of this process, via psutil when it is installed."""
+    try:
+        import psutil
+    except ImportError:
+        return {}
+    process = psutil.Process(os.getpid())
+    with process.oneshot():
+        cpu = process.cpu_times()
+        memory = process.memory_info()
+        stats = {
+            "process_cpu_seconds_total": cpu.user + cpu.system,
+            "process_resident_memory_bytes": memory.rss,
+            "process_virtual_memory_bytes": memory.vms,
+            "process_threads": process.num_threads(),
+            "process_start_time_seconds": process.create_time(),
+        }
+        if hasattr(process, "num_fds"):
+            stats["process_open_fds"] = process.num_fds()
+    return stats
+
+
+class _Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """
+    Minimal in-process metrics: counters, gauges and histograms keyed by name and labels.
+    Thread-safe, since thread-pool workers report into it too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], _Histogram] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(value)
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0.0)
+
+    def render_prometheus(self) -> str:
+        """Every metric in the Prometheus text exposition format (0.0.4), plus process stats."""
+        lines: List[str] = []
+
+        def emit(kind: str, series: Dict[Tuple[str, LabelKey], float]):
+            current = None
+            for (name, labels), value in sorted(series.items()):
+                if name != current:
+                    lines.append(f"# TYPE {name} {kind}")
+                    current = name
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = [
+                (name, labels, h.buckets, list(h.counts), h.count, h.sum)
+                for (name, labels), h in sorted(self._histograms.items(), key=lambda item: item[0])
+            ]
+        emit("counter", counters)
+        emit("gauge", gauges)
+
+        current = None
+        for name, labels, buckets, counts, count, total in histograms:
+            if name != current:
+                lines.append(f"# TYPE {name} histogram")
+                current = name
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        for name, value in process_metrics().items():
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, list]:
+        """JSON-friendly view of every metric."""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "gauges": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._gauges.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum}
+                    for (name, labels), h in sorted(self._histograms.items(), key=lambda item: item[0])
+                ],
+            }
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,86 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+
+from app.services.metrics import metrics
+from app.services.resilience import DeadlineExceeded, time_remaining
+
+logger = logging.getLogger(__name__)
+
+SendFunc = Callable[[Hashable, List[str]], Awaitable[Dict[str, Any]]]
+
+
+class _PendingBatch:
+    def __init__(self):
+        self.texts: Dict[str, None] = {}
+        self.requests: List[Tuple[List[str], asyncio.Future]] = []
+        self.timer = None
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests that share a key into one upstream call.
+    Requests are collected for up to `window_ms` or until `max_batch_size` unique texts are
+    pending, then `send(key, texts)` is called once and its {text: value} result is fanned
+    back out to every waiting caller, in each caller's own text order.
+    """
+
+    def __init__(self, name: str, send: SendFunc, window_ms: float, max_batch_size: int):
+        self.name = name
+        self._send = send
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._batches: Dict[Hashable, _PendingBatch] = {}
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def submit(self, key: Hashable, texts: List[str]) -> List[Any]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _PendingBatch()
+            batch.timer = loop.call_later(self.window, self._flush, key)
+        batch.requests.append((texts, future))
+        batch.texts.update(dict.fromkeys(texts))
+        if len(batch.texts) >= self.max_batch_size:
+            self._flush(key)
+        # The batch runs without any caller's deadline, so each caller enforces its own here.
+        # Timing out cancels the future, which drops this caller's texts if not sent yet.
+        try:
+            return await asyncio.wait_for(future, time_remaining())
+        except asyncio.TimeoutError:
+            if not future.cancelled():
+                raise  # the upstream call itself timed out
+            raise DeadlineExceeded(f"Request deadline exceeded waiting for the {self.name} batch") from None
+
+    def _flush(self, key: Hashable):
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        # Run the shared call outside any one caller's context, so the first caller's
+        # request deadline does not cut the batch short for everyone else (see submit)
+        task = contextvars.Context().run(asyncio.ensure_future, self._send_batch(key, batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send_batch(self, key: Hashable, batch: _PendingBatch):
+        # Callers that were cancelled while waiting do not need their texts sent
+        live = [(texts, future) for texts, future in batch.requests if not future.done()]
+        if not live:
+            return
+        texts = list(dict.fromkeys(text for request_texts, _ in live for text in request_texts))
+        metrics.inc("micro_batch_upstream_calls_total", upstream=self.name)
+        metrics.inc("micro_batch_requests_total", len(live), upstream=self.name)
+        metrics.inc("micro_batch_texts_total", len(texts), upstream=self.name)
+        try:
+            values = await self._send(key, texts)
+        except Exception as e:
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for request_texts, future in live:
+            if not future.done():
+                future.set_result([values.get(text) for text in request_texts])
@@ -0,0 +1,420 @@
+import asyncio
+import hashlib
+import json
+import time
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+from pydantic import ValidationError
+from app.schemas.nlp_models import FlexibleTextRequest, TaskAnalysis
+from app.services.llm_client import call_llm_api, stream_llm_api
+from app.services.payload_builder import build_llm_payload
+from app.services.context_packer import pack_context
+from app.rag.retrieval_service import retrieval_service
+from app.rag.embedding_client import get_embeddings
+from app.rag.topic_router import topic_router
+from app.services.response_cache import normalize_text, response_cache
+from app.services.concurrency import gather_bounded
+from app.services.metrics import metrics
+from app.services.tracing import record_stage
+from app.services.resilience import deadline_scope, has_budget
+from app.services.singleflight import SingleFlight
+from app.config import (
+    TOPIC_ROUTER_ENABLED,
+    ENRICH_MAX_INPUT_CHARS,
+    REQUEST_DEADLINE_SECONDS,
+    DEADLINE_ENRICH_MIN_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+TASK_PROMPTS = {
+    # Short, fixed answer formats so they fit the classify/sentiment generation caps
+    "classify": "Classify the following text. Answer with the category name, then one sentence explaining why",
+    "entities": ("Extract all named entities from the following text. Return the result as a table with two columns: 'Entity' and 'Type'. Each entity should be on a new line."),
+    "summarize": "Summarize the following text",
+    "sentiment": ("Analyze the sentiment of the following text. Answer with one word (Positive, Negative, Neutral or Mixed), "
+                  "then one sentence explaining why"),
+}
+
+
+NO_TEXT_MESSAGE = "No text provided for processing."
+
+# Pseudo task type of /nlp/analyze, which answers several tasks in one call
+ANALYZE_TASK = "analyze"
+
+
+def get_task_prompt(task_type: str) -> str:
+    return TASK_PROMPTS.get(task_type, "Process the following text")
+
+
+def build_analyze_prompt(tasks: List[str]) -> str:
+    fields = "\n".join(f'- "{task}": {TASK_PROMPTS[task].rstrip(".")}.' for task in tasks)
+    return (
+        "Perform each of the following tasks on the text below. Reply with only a JSON object "
+        "that has exactly these keys, each with a string value:\n"
+        f"{fields}\nText"
+    )
+
+
+def parse_analysis(raw: str, tasks: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Extract the per-task answers from a multi-task completion.
+    Each field is validated on its own; fields that are missing or invalid come back as None.
+    """
+    start, end = raw.find("{"), raw.rfind("}")
+    try:
+        data = json.loads(raw[start:end + 1]) if 0 <= start < end else {}
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    answers = {}
+    for task in tasks:
+        try:
+            answers[task] = getattr(TaskAnalysis.model_validate({task: data.get(task)}), task)
+        except ValidationError:
+            answers[task] = None
+    return answers
+
+
+async def ask_llm_about_target_topics(text: str) -> bool:
+    """
+    Use the LLM to check if the text is about Deep Learning, Machine Learning, or Agentic AI.
+    Returns True if yes, False otherwise.
+    """
+    try:
+        check_prompt = (
+            "Is the following text about Deep Learning, Machine Learning, or Agentic AI? "
+            "Reply with only 'yes' or 'no'. Text: "
+        )
+        payload = build_llm_payload(check_prompt, text, profile="gate")
+        response = await call_llm_api(payload, timeout=15.0)
+        return response.strip().lower().startswith('yes')
+    except Exception:
+        # If LLM call fails, assume it's not about target topics
+        return False
+
+
+async def is_query_about_target_topics(text: str, embedding: Optional[List[float]] = None) -> bool:
+    """
+    Check if the text is about Deep Learning, Machine Learning, or Agentic AI.
+    The local embedding-based topic router answers confident cases; only uncertain
+    ones fall back to an LLM yes/no call.
+    Returns True if yes, False otherwise.
+    """
+    if TOPIC_ROUTER_ENABLED:
+        if embedding is not None:
+            decision = await topic_router.classify_embedding(embedding)
+        else:
+            decision = await topic_router.classify(text)
+        if decision is not None:
+            return decision
+    return await ask_llm_about_target_topics(text)
+
+
+async def fetch_information_from_llm(text: str) -> str:
+    """
+    Fetch information from LLM when additional context is needed.
+    This function generates content based on the user's text.
+    """
+    try:
+        info_prompt = f"Provide comprehensive information about: {text}. Give detailed explanation with examples."
+        payload = build_llm_payload(info_prompt, text, profile="enrich")
+        return await call_llm_api(payload, timeout=30.0)
+    except Exception as e:
+        # If LLM call fails, return the original text
+        return f"Error fetching additional information: {str(e)}. Processing original text: {text}"
+
+
+async def fetch_information_from_rag(text: str, relevant_docs: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Fetch information from RAG when additional context is needed.
+    This function retrieves relevant documents (unless already given) and generates content.
+    """
+    try:
+        # Retrieve relevant documents
+        if relevant_docs is None:
+            relevant_docs = await retrieval_service.search_ranked(text, top_k=5)
+        # Deduplicated and trimmed by score to the context token budget
+        context = pack_context(relevant_docs)
+
+        # Generate comprehensive information based on retrieved documents
+        rag_prompt = f"Based on the following context, provide comprehensive information about: {text}\n\nContext:\n{context}"
+        payload = build_llm_payload(rag_prompt, text, profile="enrich_rag")
+        return await call_llm_api(payload, timeout=30.0)
+    except Exception:
+        # If RAG fails, fallback to direct LLM
+        return await fetch_information_from_llm(text)
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+class RequestPlan:
+    """
+    Per-request execution plan of stages: gate, retrieve, enrich and task.
+    Each stage result is memoized for the lifetime of the request, so the same text is
+    never embedded, classified or retrieved twice (also across items of a list request).
+    """
+
+    def __init__(self, task_type: str, use_cache: bool = True):
+        self.task_type = task_type
+        self.prompt = get_task_prompt(task_type)
+        self.use_cache = use_cache and response_cache.enabled_for(task_type)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._memo: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.steps: List[Dict[str, Any]] = []
+        # Texts whose answer was produced with a stage skipped for lack of time; not cached
+        self._degraded: Set[str] = set()
+
+    @property
+    def cache_status(self) -> str:
+        """Value for the X-Cache response header."""
+        if not self.use_cache:
+            return "BYPASS"
+        return "HIT" if self.cache_hits and not self.cache_misses else "MISS"
+
+    async def _stage(self, stage: str, text: str, factory: Callable[[], Awaitable[Any]]):
+        key = (stage, text)
+        task = self._memo.get(key)
+        if task is not None:
+            self.steps.append({"stage": stage, "input": _text_key(text), "memoized": True})
+            return await task
+        task = asyncio.ensure_future(factory())
+        self._memo[key] = task
+        start = time.perf_counter()
+        try:
+            return await task
+        finally:
+            duration = time.perf_counter() - start
+            record_stage(stage, duration)
+            self.steps.append({
+                "stage": stage,
+                "input": _text_key(text),
+                "memoized": False,
+                "duration_ms": round(duration * 1000, 2),
+            })
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        async def run():
+            try:
+                response = await get_embeddings(text)
+                return response['result']['data'][0]['embedding']
+            except Exception as e:
+                logger.warning(f"Embedding stage failed: {str(e)}")
+                return None
+        return await self._stage("embed", text, run)
+
+    async def gate(self, text: str) -> bool:
+        async def run():
+            embedding = await self.embed(text) if TOPIC_ROUTER_ENABLED else None
+            return await is_query_about_target_topics(text, embedding=embedding)
+        return await self._stage("gate", text, run)
+
+    async def retrieve(self, text: str) -> List[Dict[str, Any]]:
+        """Ranked passages (id, text, score) for the text."""
+        async def run():
+            try:
+                embedding = await self.embed(text)
+                return await retrieval_service.search_ranked(text, top_k=5, query_embedding=embedding)
+            except Exception as e:
+                logger.warning(f"Retrieval stage failed: {str(e)}")
+                return []
+        return await self._stage("retrieve", text, run)
+
+    async def enrich(self, text: str) -> str:
+        async def run():
+            if await self.gate(text):
+                return await fetch_information_from_rag(text, await self.retrieve(text))
+            # For non-target topics, fetch information from LLM to provide context
+            return await fetch_information_from_llm(text)
+        return await self._stage("enrich", text, run)
+
+    async def task(self, text: str) -> str:
+        """Run the NLP task for one input text and return the LLM answer."""
+        async def run():
+            if not self.use_cache:
+                return await self._compute_task(text)
+            embedding = await self.embed(text) if response_cache.semantic else None
+            cached = response_cache.get(self.task_type, text, embedding)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+            result = await self._compute_task(text)
+            if text not in self._degraded:
+                response_cache.set(self.task_type, text, result, embedding)
+            return result
+        return await self._stage("task", text, run)
+
+    def _skip(self, stage: str, text: str, reason: str):
+        self._degraded.add(text)
+        self.steps.append({"stage": stage, "input": _text_key(text), "memoized": False, "skipped": reason})
+        metrics.inc("pipeline_degraded_total", stage=stage, task=self.task_type)
+
+    async def analyze(self, text: str, tasks: List[str]) -> Dict[str, str]:
+        """Answer several tasks for one text; gate, retrieval and enrichment run once for all of them."""
+        cache_key = f"{ANALYZE_TASK}:{','.join(tasks)}"
+
+        async def run():
+            if self.use_cache:
+                cached = response_cache.get(cache_key, text)
+                if cached is not None:
+                    self.cache_hits += 1
+                    return cached
+                self.cache_misses += 1
+            result = await self._compute_analysis(text, tasks)
+            if self.use_cache and text not in self._degraded:
+                response_cache.set(cache_key, text, result)
+            return result
+        return await self._stage("analyze", text, run)
+
+    async def _compute_analysis(self, text: str, tasks: List[str]) -> Dict[str, str]:
+        prompt, source = await self._prepare_task(text, build_analyze_prompt(tasks))
+        try:
+            raw = await call_llm_api(build_llm_payload(prompt, source, profile=ANALYZE_TASK), timeout=30.0)
+        except Exception as e:
+            logger.warning(f"Multi-task call failed, answering tasks separately: {str(e)}")
+            raw = ""
+        answers = parse_analysis(raw, tasks)
+        failed = [task for task, answer in answers.items() if answer is None]
+        metrics.inc("analyze_fields_total", len(tasks) - len(failed), outcome="structured")
+        if failed:
+            metrics.inc("analyze_fields_total", len(failed), outcome="fallback")
+            logger.info(f"Falling back to single-task calls for {failed}")
+            # The earlier stages are memoized, so each fallback costs only its task call
+            outcomes = await gather_bounded(failed, lambda task: self._compute_task(text, get_task_prompt(task), profile=task))
+            for task, outcome in zip(failed, outcomes):
+                answers[task] = f"Error processing text: {str(outcome)}" if isinstance(outcome, Exception) else outcome
+        return answers
+
+    async def _prepare_task(self, text: str, prompt: Optional[str] = None) -> Tuple[str, str]:
+        """Gate, optionally enrich and retrieve; returns the (prompt, text) for the task LLM."""
+        prompt = prompt or self.prompt
+        on_topic = await self.gate(text)
+        # Short inputs are expanded first; long inputs already carry enough content
+        needs_enrichment = len(text) <= ENRICH_MAX_INPUT_CHARS
+        if needs_enrichment and not has_budget(DEADLINE_ENRICH_MIN_SECONDS):
+            # Too close to the request deadline for an extra LLM call before the task itself
+            needs_enrichment = False
+            self._skip("enrich", text, "deadline")
+        source = await self.enrich(text) if needs_enrichment else text
+        relevant_docs = await self.retrieve(text) if on_topic else []
+        # Context is added unless the enrichment already folded the documents in
+        if relevant_docs and (not needs_enrichment or len(source) <= ENRICH_MAX_INPUT_CHARS):
+            context = pack_context(relevant_docs)
+            final_prompt = (
+                f"{prompt} (with the following context):\nUser Query: {source}\n\nRelevant Documents:\n{context}"
+            )
+            return final_prompt, source
+        return prompt, source
+
+    async def _compute_task(self, text: str, prompt: Optional[str] = None, profile: Optional[str] = None) -> str:
+        prompt, source = await self._prepare_task(text, prompt)
+        payload = build_llm_payload(prompt, source, profile=profile or self.task_type)
+        return await call_llm_api(payload, timeout=30.0)
+
+    async def task_stream(self, text: str) -> AsyncIterator[str]:
+        """
+        Streaming variant of task(): the gate, retrieval and enrichment stages run first,
+        then the task completion is yielded token by token. Cache hits are yielded whole.
+        """
+        embedding = None
+        if self.use_cache:
+            embedding = await self.embed(text) if response_cache.semantic else None
+            cached = response_cache.get(self.task_type, text, embedding)
+            if cached is not None:
+                self.cache_hits += 1
+                yield cached
+                return
+            self.cache_misses += 1
+        prompt, source = await self._prepare_task(text)
+        started = time.perf_counter()
+        parts = []
+        async for token in stream_llm_api(build_llm_payload(prompt, source, stream=True, profile=self.task_type), timeout=30.0):
+            parts.append(token)
+            yield token
+        duration = time.perf_counter() - started
+        record_stage("task", duration)
+        self.steps.append({
+            "stage": "task",
+            "input": _text_key(text),
+            "memoized": False,
+            "streamed": True,
+            "duration_ms": round(duration * 1000, 2),
+        })
+        if self.use_cache and text not in self._degraded:
+            response_cache.set(self.task_type, text, "".join(parts), embedding)
+
+    def describe(self) -> Dict[str, Any]:
+        """Debug view of the executed plan."""
+        return {
+            "task_type": self.task_type,
+            "steps": self.steps,
+            "executed_stages": sum(1 for step in self.steps if not step["memoized"] and not step.get("skipped")),
+            "cache": self.cache_status,
+        }
+
+
+def has_text_to_process(req: FlexibleTextRequest) -> bool:
+    return bool(
+        req.text and
+        ((isinstance(req.text, str) and req.text.strip()) or
+         (isinstance(req.text, list) and any(t.strip() for t in req.text)))
+    )
+
+
+# Concurrent identical requests share one execution (and its plan)
+request_flights = SingleFlight("nlp_request")
+
+
+def _request_key(req: FlexibleTextRequest, task_type: str) -> Hashable:
+    """Task type, task list and normalized text(s), keyed exactly like the response cache."""
+    if not has_text_to_process(req):
+        texts = None
+    elif isinstance(req.text, list):
+        texts = tuple(normalize_text(text) for text in req.text)
+    else:
+        texts = normalize_text(req.text)
+    tasks = tuple(req.tasks) if task_type == ANALYZE_TASK else None
+    return (task_type, tasks, texts)
+
+
+async def execute_request(req: FlexibleTextRequest, task_type: str) -> Tuple[Any, RequestPlan]:
+    """
+    Run an NLP request through one plan and return (result, plan). Used by the API and the workers.
+    For ANALYZE_TASK the request carries a task list and each result is a {task: answer} dict.
+    Identical requests arriving while one is running wait for its result instead of running again.
+    """
+    return await request_flights.do(_request_key(req, task_type), lambda: _execute_request(req, task_type))
+
+
+async def _execute_request(req: FlexibleTextRequest, task_type: str) -> Tuple[Any, RequestPlan]:
+    # One plan per request: gate, retrieve, enrich and task results are shared by all items
+    plan = RequestPlan(task_type)
+    if task_type == ANALYZE_TASK:
+        tasks = list(req.tasks)
+        run = lambda text: plan.analyze(text, tasks)
+    else:
+        run = plan.task
+
+    # Every stage and upstream call below shares one end-to-end deadline
+    with deadline_scope(REQUEST_DEADLINE_SECONDS):
+        if not has_text_to_process(req):
+            # No text provided, process the default message
+            results = await run(NO_TEXT_MESSAGE)
+        elif isinstance(req.text, list):
+            # Items run in parallel; each one reports its own error without cancelling the others
+            outcomes = await gather_bounded(req.text, run)
+            results = [
+                f"Error processing text: {str(outcome)}" if isinstance(outcome, Exception) else outcome
+                for outcome in outcomes
+            ]
+        else:
+            try:
+                results = await run(req.text)
+            except Exception as e:
+                results = f"Error processing text: {str(e)}"
+    return results, plan
@@ -1,13 +1,18 @@
-from app.config import LLM_MODEL
+from app.config import LLM_MODEL, LLM_GENERATION_PROFILES
 
-def build_llm_payload(task_prompt: str, user_text: str):
+def generation_profile(name: str):
+    """Generation settings for a kind of call, on top of the defaults."""
+    return {**LLM_GENERATION_PROFILES["default"], **LLM_GENERATION_PROFILES.get(name, {})}
+
+def build_llm_payload(task_prompt: str, user_text: str, stream: bool = False, profile: str = "default"):
+    settings = generation_profile(profile)
     return {
         "model": LLM_MODEL,
         "messages": [
             {"role": "user", "content": f"{task_prompt}: {user_text}"}
         ],
-        "temperature": 0.7,
-        "web_search": True,
-        "stream": False,
-        "max_tokens": 1000
+        "temperature": settings["temperature"],
+        "web_search": settings["web_search"],
+        "stream": stream,
+        "max_tokens": settings["max_tokens"]
     }
@@ -0,0 +1,149 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from typing import Deque, Optional
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `burst`. acquire() reserves a
+    token right away (the balance may go negative) and sleeps off the deficit, so waiters
+    are served in arrival order and the long-run rate never exceeds `rate`.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token would be available to a new caller."""
+        self._refill()
+        return max(0.0, (1.0 - self._tokens) / self.rate)
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Take a token, waiting up to `timeout` seconds; False when it would take longer."""
+        wait = self.wait_time()
+        if timeout is not None and wait > timeout:
+            return False
+        self._tokens -= 1.0
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Hand the reservation back to the callers queued behind
+                self._tokens += 1.0
+                raise
+        return True
+
+
+class UpstreamLimiter:
+    """
+    Client-side limits for one upstream: a request rate (token bucket) and a cap on calls in
+    flight. Either can be None to leave it unlimited. Calls wait for capacity within their
+    own timeout, so a burst is smoothed instead of being forwarded to the upstream at once.
+    """
+
+    def __init__(self, name: str, rate_per_second: Optional[float] = None, burst: Optional[int] = None,
+                 max_concurrency: Optional[int] = None):
+        self.name = name
+        self.bucket = TokenBucket(rate_per_second, burst or max(1, int(rate_per_second))) if rate_per_second else None
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        # Callers waiting for a concurrency slot, served first come first served
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def retry_after(self) -> float:
+        """Rough seconds until capacity frees up, for Retry-After."""
+        return max(1.0, self.bucket.wait_time() if self.bucket else 0.0)
+
+    def _slot_free(self) -> bool:
+        return self.max_concurrency is None or (self.in_flight < self.max_concurrency and not self._waiters)
+
+    def _take_slot(self):
+        self.in_flight += 1
+        metrics.set_gauge("upstream_in_flight", self.in_flight, upstream=self.name)
+
+    def _give_back_slot(self):
+        self.in_flight -= 1
+        # Hand the slot straight to the longest waiter, so newcomers cannot overtake it
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+                break
+        metrics.set_gauge("upstream_in_flight", self.in_flight, upstream=self.name)
+
+    async def _wait_for_slot(self, timeout: Optional[float]) -> bool:
+        if self._slot_free():
+            self._take_slot()
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        metrics.set_gauge("upstream_limiter_waiting", len(self._waiters), upstream=self.name)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            return True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # The slot was handed over just as we gave up; pass it on
+                self._give_back_slot()
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return False
+        finally:
+            metrics.set_gauge("upstream_limiter_waiting", len(self._waiters), upstream=self.name)
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now (used for optional work such as hedges)."""
+        if not self._slot_free():
+            return False
+        if self.bucket is not None and not self.bucket.try_acquire():
+            return False
+        self._take_slot()
+        return True
+
+    async def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to `timeout` seconds for a slot; False when none freed up in time."""
+        started = time.monotonic()
+        try:
+            if not await self._wait_for_slot(timeout):
+                metrics.inc("upstream_limited_total", upstream=self.name, reason="concurrency")
+                return False
+            if self.bucket is not None:
+                left = None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+                try:
+                    granted = await self.bucket.acquire(left)
+                except asyncio.CancelledError:
+                    self._give_back_slot()
+                    raise
+                if not granted:
+                    self._give_back_slot()
+                    metrics.inc("upstream_limited_total", upstream=self.name, reason="rate")
+                    return False
+            return True
+        finally:
+            metrics.observe("upstream_limiter_wait_seconds", time.monotonic() - started, upstream=self.name)
+
+    def release(self):
+        self._give_back_slot()
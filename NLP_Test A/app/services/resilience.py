@@ -0,0 +1,238 @@
+import asyncio
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+from app.config import (
+    HEDGE_ENABLED,
+    HEDGE_UPSTREAMS,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_DELAY_MS,
+    HEDGE_MAX_DELAY_MS,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MAX_RATIO,
+    UPSTREAM_LATENCY_WINDOW,
+    UPSTREAM_BREAKER_FAILURE_THRESHOLD,
+    UPSTREAM_BREAKER_RESET_SECONDS,
+    UPSTREAM_LIMITS,
+    UPSTREAM_LIMIT_MAX_WAIT_SECONDS,
+)
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.http_client import UPSTREAM_TIMEOUTS
+from app.services.rate_limit import UpstreamLimiter
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() deadline of the current request, inherited by the tasks it spawns
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's end-to-end deadline ran out before the upstream answered."""
+
+
+class UpstreamUnavailable(Exception):
+    """The upstream's circuit breaker is open."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} upstream unavailable, retry in {retry_after:.0f}s")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class UpstreamSaturated(UpstreamUnavailable):
+    """The client-side rate or concurrency limit for the upstream had no room in time."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(upstream, retry_after)
+        self.args = (f"{upstream} upstream is at its request limit, retry in {retry_after:.0f}s",)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Set an end-to-end deadline for the enclosed work. An enclosing, earlier deadline wins."""
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None when no deadline is set."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def has_budget(seconds: float) -> bool:
+    remaining = time_remaining()
+    return remaining is None or remaining >= seconds
+
+
+class Upstream:
+    """
+    Resilience policy for one upstream: a circuit breaker, deadline-capped timeouts and,
+    when enabled, hedging. A hedged call sends a duplicate request once the first one is
+    slower than the upstream's recent latency percentile and keeps whichever answers first.
+    Hedges are capped at HEDGE_MAX_RATIO of calls so a slow upstream is not doubly loaded.
+    Every request, hedges included, also takes a slot from the upstream's rate/concurrency limiter.
+    """
+
+    def __init__(self, name: str, hedge: bool = False):
+        self.name = name
+        self.hedge = hedge and HEDGE_ENABLED
+        self.breaker = CircuitBreaker(UPSTREAM_BREAKER_FAILURE_THRESHOLD, UPSTREAM_BREAKER_RESET_SECONDS)
+        self._latencies: Deque[float] = deque(maxlen=UPSTREAM_LATENCY_WINDOW)
+        self._calls = 0
+        self._hedges = 0
+        self.limiter = UpstreamLimiter(name, **UPSTREAM_LIMITS.get(name, {}))
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None when there is not enough history or hedge budget."""
+        if not self.hedge or self._hedges >= HEDGE_MAX_RATIO * self._calls:
+            return None
+        observed = self.latency_percentile(HEDGE_PERCENTILE)
+        if observed is None:
+            return None
+        return min(max(observed, HEDGE_MIN_DELAY_MS / 1000), HEDGE_MAX_DELAY_MS / 1000)
+
+    def timeout(self, default: Optional[float]) -> float:
+        """The per-call timeout (the upstream's own when not given), capped by the request deadline."""
+        if default is None:
+            default = UPSTREAM_TIMEOUTS[self.name]
+        remaining = time_remaining()
+        if remaining is None:
+            return default
+        if remaining <= 0:
+            raise DeadlineExceeded(f"No time left for the {self.name} call")
+        return min(default, remaining)
+
+    def check(self):
+        """Raise UpstreamUnavailable if the breaker rejects the call."""
+        if not self.breaker.allow():
+            metrics.inc("upstream_requests_total", upstream=self.name, outcome="circuit_open")
+            raise UpstreamUnavailable(self.name, self.breaker.retry_after())
+
+    async def acquire(self, timeout: Optional[float]) -> Optional[float]:
+        """
+        Wait for a limiter slot, within the call's timeout. Returns the timeout left for the
+        call itself; raises UpstreamSaturated when no slot frees up in time.
+        Must follow check(), and release() must follow a successful acquire.
+        """
+        started = time.monotonic()
+        try:
+            acquired = await self.limiter.acquire(UPSTREAM_LIMIT_MAX_WAIT_SECONDS if timeout is None else timeout)
+        except asyncio.CancelledError:
+            self.breaker.release_trial()
+            raise
+        left = None if timeout is None else timeout - (time.monotonic() - started)
+        if acquired and (left is None or left > 0):
+            return left
+        if acquired:
+            self.limiter.release()
+        self.breaker.release_trial()
+        metrics.inc("upstream_requests_total", upstream=self.name, outcome="limited")
+        raise UpstreamSaturated(self.name, self.limiter.retry_after())
+
+    def release(self):
+        self.limiter.release()
+
+    def record(self, ok: bool, latency: Optional[float] = None):
+        if ok:
+            self.breaker.record_success()
+            if latency is not None:
+                self._latencies.append(latency)
+                metrics.observe("upstream_latency_seconds", latency, upstream=self.name)
+        else:
+            self.breaker.record_failure()
+        metrics.inc("upstream_requests_total", upstream=self.name, outcome="success" if ok else "failure")
+        metrics.set_gauge("upstream_circuit_open", int(self.breaker.state != CircuitBreaker.CLOSED), upstream=self.name)
+
+    async def call(self, attempt: Callable[[Optional[float]], Awaitable[T]], timeout: Optional[float] = None) -> T:
+        """
+        Run attempt(timeout) under the breaker and the request deadline, hedging if it is slow.
+        The attempt must raise on failure; its result is returned as is.
+        """
+        # Deadline first: an expired request must not take (and then strand) a half-open trial
+        timeout = self.timeout(timeout)
+        self.check()
+        timeout = await self.acquire(timeout)
+        self._calls += 1
+        started = time.perf_counter()
+        try:
+            result = await self._first_success(attempt, timeout)
+        except asyncio.CancelledError:
+            # The caller gave up; this says nothing about the upstream's health
+            self.breaker.release_trial()
+            raise
+        except Exception as e:
+            self.record(False)
+            if time_remaining() == 0:
+                raise DeadlineExceeded(f"Request deadline exceeded waiting for {self.name}") from e
+            raise
+        finally:
+            self.release()
+        self.record(True, time.perf_counter() - started)
+        return result
+
+    async def _first_success(self, attempt: Callable[[Optional[float]], Awaitable[T]], timeout: Optional[float]) -> T:
+        ends_at = None if timeout is None else time.monotonic() + timeout
+
+        def left() -> Optional[float]:
+            return None if ends_at is None else max(0.0, ends_at - time.monotonic())
+
+        primary = asyncio.ensure_future(attempt(timeout))
+        tasks = [primary]
+        try:
+            delay = self.hedge_delay()
+            if delay is not None and (timeout is None or delay < timeout):
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                # A hedge is optional load, so it only goes out if the limiter has room right now
+                if not done and self.limiter.try_acquire():
+                    self._hedges += 1
+                    metrics.inc("upstream_hedges_total", upstream=self.name)
+                    hedge = asyncio.ensure_future(attempt(left()))
+                    hedge.add_done_callback(lambda _: self.limiter.release())
+                    tasks.append(hedge)
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=left(), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            metrics.inc("upstream_hedge_wins_total", upstream=self.name)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+# Hedging is only worth it where duplicates are cheap; see HEDGE_UPSTREAMS
+upstreams: Dict[str, Upstream] = {
+    name: Upstream(name, hedge=name in HEDGE_UPSTREAMS)
+    for name in ("llm", "embedding", "rerank")
+}
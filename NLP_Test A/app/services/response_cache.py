@@ -0,0 +1,147 @@
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.config import (
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_DISABLED_TASKS,
+    RESPONSE_CACHE_SEMANTIC_ENABLED,
+    RESPONSE_CACHE_SEMANTIC_MAX_DISTANCE,
+)
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace only; case is kept since it can change the answer ("Apple" vs "apple")."""
+    return " ".join(text.split())
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
+
+
+@dataclass
+class CachedResponse:
+    result: Any
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of task completions keyed by (task_type, normalized text).
+    In semantic mode a miss falls back to the closest cached entry of the same task
+    whose embedding lies within the configured cosine distance. Entry embeddings are rows
+    of one NumPy matrix, so that lookup is a single matrix-vector product.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        semantic: bool = RESPONSE_CACHE_SEMANTIC_ENABLED,
+        max_distance: float = RESPONSE_CACHE_SEMANTIC_MAX_DISTANCE
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic = semantic
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        # Semantic mode: unit embeddings by row, the key owning each row and free rows
+        self._matrix: Optional[np.ndarray] = None
+        self._row_of: Dict[Tuple[str, str], int] = {}
+        self._row_keys: List[Optional[Tuple[str, str]]] = []
+        self._free_rows: List[int] = []
+
+    def enabled_for(self, task_type: str) -> bool:
+        return RESPONSE_CACHE_ENABLED and task_type not in RESPONSE_CACHE_DISABLED_TASKS
+
+    def _store_embedding(self, key: Tuple[str, str], embedding: List[float]):
+        vector = _unit(embedding)
+        if self._matrix is None or self._matrix.shape[1] != len(vector):
+            # First embedding, or the embedding model changed: start a new matrix
+            self._matrix = np.zeros((self.max_entries + 1, len(vector)), dtype=np.float32)
+            self._row_of, self._row_keys, self._free_rows = {}, [], []
+        row = self._row_of.get(key)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                row = len(self._row_keys)
+                self._row_keys.append(None)
+            self._row_of[key] = row
+            self._row_keys[row] = key
+        self._matrix[row] = vector
+
+    def _drop_embedding(self, key: Tuple[str, str]):
+        row = self._row_of.pop(key, None)
+        if row is not None:
+            self._matrix[row] = 0.0
+            self._row_keys[row] = None
+            self._free_rows.append(row)
+
+    def _remove(self, key: Tuple[str, str]):
+        self._entries.pop(key, None)
+        self._drop_embedding(key)
+
+    def _semantic_lookup(self, task_type: str, embedding: List[float]) -> Optional[Tuple[str, str]]:
+        query = _unit(embedding)
+        if self._matrix is None or self._matrix.shape[1] != len(query) or not self._row_of:
+            return None
+        similarities = self._matrix[:len(self._row_keys)] @ query
+        # Empty rows are all zeros, so they only pass a threshold no real match needs
+        rows = np.flatnonzero(similarities >= 1.0 - self.max_distance)
+        now = time.monotonic()
+        for row in rows[np.argsort(-similarities[rows])]:
+            key = self._row_keys[row]
+            if key is None or key[0] != task_type:
+                continue
+            if self._entries[key].expires_at < now:
+                continue
+            return key
+        return None
+
+    def get(self, task_type: str, text: str, embedding: Optional[List[float]] = None) -> Optional[Any]:
+        key = (task_type, normalize_text(text))
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None and self.semantic and embedding:
+            semantic_key = self._semantic_lookup(task_type, embedding)
+            if semantic_key is not None:
+                key, entry = semantic_key, self._entries[semantic_key]
+                metrics.inc("response_cache_semantic_hits_total", task_type=task_type)
+        if entry is None:
+            metrics.inc("response_cache_misses_total", task_type=task_type)
+            return None
+        self._entries.move_to_end(key)
+        metrics.inc("response_cache_hits_total", task_type=task_type)
+        return entry.result
+
+    def set(self, task_type: str, text: str, result: Any, embedding: Optional[List[float]] = None):
+        key = (task_type, normalize_text(text))
+        self._entries[key] = CachedResponse(result=result, expires_at=time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        if self.semantic and embedding:
+            self._store_embedding(key, embedding)
+        else:
+            self._drop_embedding(key)
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            self._drop_embedding(oldest)
+
+    def clear(self):
+        self._entries.clear()
+        self._matrix = None
+        self._row_of, self._row_keys, self._free_rows = {}, [], []
+
+
+response_cache = ResponseCache()
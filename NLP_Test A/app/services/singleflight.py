@@ -0,0 +1,72 @@
+import asyncio
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+from app.config import SINGLEFLIGHT_ENABLED
+from app.services.metrics import metrics
+from app.services.tracing import record_stage
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution: the first caller starts
+    the work, callers arriving while it runs await the same result (or exception). Nothing is
+    kept once the work finishes, so this is not a cache; it only stops duplicate in-flight work.
+
+    The shared work runs as its own task. A cancelled caller stops waiting without cancelling
+    it for the others; the work is cancelled only when every caller has gone.
+    """
+
+    def __init__(self, name: str, enabled: bool = SINGLEFLIGHT_ENABLED):
+        self.name = name
+        self.enabled = enabled
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+            metrics.set_gauge("singleflight_in_flight", len(self._flights), operation=self.name)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            return await factory()
+        flight = self._flights.get(key)
+        if flight is None:
+            # Runs in a copy of the first caller's context (its deadline and trace)
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(factory()))
+            flight.task.add_done_callback(lambda _, flight=flight: self._forget(key, flight))
+            metrics.inc("singleflight_calls_total", operation=self.name)
+            metrics.set_gauge("singleflight_in_flight", len(self._flights), operation=self.name)
+            return await self._wait(key, flight)
+
+        metrics.inc("singleflight_coalesced_total", operation=self.name)
+        started = time.perf_counter()
+        try:
+            return await self._wait(key, flight)
+        finally:
+            record_stage(f"{self.name}_coalesced", time.perf_counter() - started)
+
+    async def _wait(self, key: Hashable, flight: _Flight) -> Any:
+        flight.waiters += 1
+        try:
+            # Shielded so one caller's cancellation does not reach the shared task
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                logger.debug(f"All callers of {self.name} left, cancelling the shared call")
+                # Forget it first so a new caller starts fresh instead of joining a cancelled call
+                self._forget(key, flight)
+                flight.task.cancel()
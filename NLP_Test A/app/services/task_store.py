@@ -0,0 +1,70 @@
+import json
+import time
+import logging
+from typing import Any, Dict, Optional
+from app.config import REDIS_URL, TASK_STORE_BACKEND, TASK_RESULT_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "nlp:task:"
+# The memory backend sweeps expired entries on write at most this often
+MEMORY_PURGE_INTERVAL_SECONDS = 60.0
+
+
+class TaskStore:
+    """
+    Status and result of background NLP tasks, shared by the API and the workers.
+    Backed by Redis with a TTL; the "memory" backend keeps entries in-process for tests and local runs,
+    dropping expired ones on read and in a periodic sweep on write, so records nobody polls do not pile up.
+    """
+
+    def __init__(self, backend: str = TASK_STORE_BACKEND, ttl: int = TASK_RESULT_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self._memory: Dict[str, tuple] = {}
+        self._next_purge = 0.0
+        self._redis = None
+
+    def _get_redis(self):
+        if self._redis is None:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(REDIS_URL)
+        return self._redis
+
+    async def set(self, task_id: str, status: str, **fields: Any) -> Dict[str, Any]:
+        record = {"task_id": task_id, "status": status, "updated_at": time.time(), **fields}
+        if self.backend == "memory":
+            now = time.monotonic()
+            if now >= self._next_purge:
+                self._purge_expired(now)
+            self._memory[task_id] = (now + self.ttl, record)
+        else:
+            await self._get_redis().set(KEY_PREFIX + task_id, json.dumps(record), ex=self.ttl)
+        return record
+
+    def _purge_expired(self, now: float):
+        expired = [task_id for task_id, (expires_at, _) in self._memory.items() if expires_at < now]
+        for task_id in expired:
+            del self._memory[task_id]
+        self._next_purge = now + MEMORY_PURGE_INTERVAL_SECONDS
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        if self.backend == "memory":
+            entry = self._memory.get(task_id)
+            if entry is None:
+                return None
+            expires_at, record = entry
+            if expires_at < time.monotonic():
+                del self._memory[task_id]
+                return None
+            return record
+        value = await self._get_redis().get(KEY_PREFIX + task_id)
+        return json.loads(value) if value is not None else None
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+
+task_store = TaskStore()
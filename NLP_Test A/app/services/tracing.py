@@ -0,0 +1,118 @@
+import time
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+from app.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Stage timings recorded outside of an HTTP request (Celery jobs, webhook delivery, shared batches)
+BACKGROUND_ENDPOINT = "background"
+
+
+class RequestTrace:
+    """Stage durations collected during one HTTP request; child tasks share it through the contextvar."""
+
+    __slots__ = ("spans", "endpoint", "finished")
+
+    def __init__(self):
+        self.spans: Dict[str, List[float]] = {}
+        self.endpoint = BACKGROUND_ENDPOINT
+        self.finished = False
+
+    def server_timing(self, total: float) -> str:
+        """Server-Timing header value: summed duration per stage, with a count when it ran more than once."""
+        entries = []
+        for stage, durations in self.spans.items():
+            entry = f"{stage};dur={sum(durations) * 1000:.1f}"
+            if len(durations) > 1:
+                entry += f';desc="x{len(durations)}"'
+            entries.append(entry)
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def record_stage(stage: str, seconds: float):
+    """
+    Record one stage duration. Inside a request it is kept on the trace and published when
+    the request ends (labeled with the route); anywhere else it is published right away.
+    """
+    trace = _trace.get()
+    if trace is None or trace.finished:
+        endpoint = trace.endpoint if trace is not None else BACKGROUND_ENDPOINT
+        metrics.observe("stage_duration_seconds", seconds, stage=stage, endpoint=endpoint)
+        return
+    trace.spans.setdefault(stage, []).append(seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that traces each HTTP request: stage timings are returned in a
+    Server-Timing header and published as stage_duration_seconds{stage, endpoint}, next to
+    http_request_duration_seconds and http_requests_total. Endpoints are labeled with the
+    route template (e.g. /nlp/tasks/{task_id}) to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Dict[Callable, str] = {}
+
+    def _endpoint_label(self, scope: Dict[str, Any]) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            for route in getattr(scope.get("app"), "routes", []):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = self._route_paths[endpoint] = route.path
+                    break
+        return path or "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace()
+        token = _trace.set(trace)
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing(time.perf_counter() - started).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _trace.reset(token)
+            elapsed = time.perf_counter() - started
+            endpoint = self._endpoint_label(scope)
+            method = scope.get("method", "")
+            # Stages still running in a streamed body are published directly from now on
+            trace.endpoint = endpoint
+            trace.finished = True
+            for stage, durations in trace.spans.items():
+                for seconds in durations:
+                    metrics.observe("stage_duration_seconds", seconds, stage=stage, endpoint=endpoint)
+            metrics.observe("http_request_duration_seconds", elapsed, endpoint=endpoint, method=method)
+            metrics.inc("http_requests_total", endpoint=endpoint, method=method, status=status)
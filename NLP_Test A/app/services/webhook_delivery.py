@@ -0,0 +1,302 @@
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+from app.config import (
+    WEBHOOK_OUTBOX_PATH,
+    WEBHOOK_WORKERS,
+    WEBHOOK_QUEUE_MAX,
+    WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_BACKOFF_BASE_SECONDS,
+    WEBHOOK_BACKOFF_MAX_SECONDS,
+    WEBHOOK_PER_HOST_CONCURRENCY,
+    WEBHOOK_BREAKER_FAILURE_THRESHOLD,
+    WEBHOOK_BREAKER_RESET_SECONDS,
+    WEBHOOK_SWEEP_INTERVAL_SECONDS,
+    WEBHOOK_DEAD_RETENTION_SECONDS,
+)
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.metrics import metrics
+from app.services.tracing import record_stage
+
+logger = logging.getLogger(__name__)
+
+Delivery = Tuple[int, str, Dict[str, Any], int]
+
+# How long a process owns a claimed outbox row before others may retry it
+CLAIM_LEASE_SECONDS = 120.0
+# How often a sweep also prunes expired dead rows
+PRUNE_INTERVAL_SECONDS = 300.0
+
+# A row is claimable only when no older row for the same order key is still pending,
+# so one task's notifications go out one at a time and in order
+_NO_OLDER_PENDING = (
+    "NOT EXISTS (SELECT 1 FROM outbox AS older WHERE older.status = 'pending' "
+    "AND older.order_key = outbox.order_key AND older.id < outbox.id)"
+)
+
+
+class WebhookOutbox:
+    """
+    SQLite outbox of undelivered notifications, so they survive restarts.
+    Rows stay 'pending' until delivered (deleted) or out of attempts ('dead'); dead rows
+    are pruned after WEBHOOK_DEAD_RETENTION_SECONDS. Rows sharing an order key (the task id)
+    are claimed strictly one at a time, oldest first. Each claim is a single UPDATE ... RETURNING,
+    so processes sharing the file never claim the same row.
+    """
+
+    def __init__(self, path: str = WEBHOOK_OUTBOX_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, payload TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, "
+                "status TEXT NOT NULL DEFAULT 'pending', last_error TEXT, created_at REAL NOT NULL, "
+                "order_key TEXT)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+            if "order_key" not in columns:
+                # Outboxes created before notifications were ordered per task
+                self._conn.execute("ALTER TABLE outbox ADD COLUMN order_key TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_order ON outbox (order_key, status, id)")
+            self._conn.commit()
+        return self._conn
+
+    def add(self, url: str, payload: Dict[str, Any], order_key: Optional[str] = None) -> Tuple[int, bool]:
+        """
+        Insert a notification. It is claimed by the calling process right away unless an older
+        notification with the same order key is still pending; then a later sweep claims it.
+        Returns (id, claimed).
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "INSERT INTO outbox (url, payload, order_key, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, CASE WHEN EXISTS (SELECT 1 FROM outbox WHERE status = 'pending' AND order_key = ?) "
+                "THEN ? ELSE ? END, ?) RETURNING id, next_attempt_at > ?",
+                (url, json.dumps(payload), order_key, order_key, now, now + CLAIM_LEASE_SECONDS, now, now)
+            ).fetchone()
+            conn.commit()
+        return row[0], bool(row[1])
+
+    def claim_due(self, limit: int) -> List[Delivery]:
+        """
+        Claim pending rows whose retry time has come, at most one per order key. Claiming
+        pushes next_attempt_at out by a lease in the same statement that selects the rows,
+        so other processes sharing the outbox cannot deliver the same row twice.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id IN ("
+                "SELECT id FROM outbox WHERE status = 'pending' AND next_attempt_at <= ? "
+                f"AND {_NO_OLDER_PENDING} ORDER BY id LIMIT ?"
+                ") RETURNING id, url, payload, attempts",
+                (now + CLAIM_LEASE_SECONDS, now, limit)
+            ).fetchall()
+            conn.commit()
+        return [(row[0], row[1], json.loads(row[2]), row[3]) for row in sorted(rows)]
+
+    def prune_dead(self, older_than: float) -> int:
+        """Delete dead rows whose last attempt was before older_than. Returns how many."""
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "DELETE FROM outbox WHERE status = 'dead' AND next_attempt_at < ?", (older_than,)
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def delete(self, delivery_id: int):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM outbox WHERE id = ?", (delivery_id,))
+            conn.commit()
+
+    def reschedule(self, delivery_id: int, attempts: int, next_attempt_at: float, error: str, dead: bool = False):
+        with self._lock:
+            conn = self._connect()
+            # A dead row's next_attempt_at records when it died, for prune_dead
+            conn.execute(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ?, status = ? WHERE id = ?",
+                (attempts, time.time() if dead else next_attempt_at, error, "dead" if dead else "pending", delivery_id)
+            )
+            conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with full jitter."""
+    ceiling = min(WEBHOOK_BACKOFF_MAX_SECONDS, WEBHOOK_BACKOFF_BASE_SECONDS * (2 ** max(0, attempts - 1)))
+    return random.uniform(0, ceiling)
+
+
+class WebhookDispatcher:
+    """
+    Fire-and-forget webhook delivery.
+    Notifications are written to the outbox and handed to a bounded pool of async workers
+    that deliver with per-host concurrency limits, a per-host circuit breaker and
+    exponential backoff with jitter. A periodic sweep re-queues due retries and anything
+    left in the outbox by a previous process.
+    """
+
+    def __init__(self, deliver: Callable[[str, Dict[str, Any]], Awaitable[bool]], outbox: Optional[WebhookOutbox] = None):
+        self._deliver = deliver
+        self.outbox = outbox or WebhookOutbox()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight: Set[int] = set()
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=WEBHOOK_QUEUE_MAX)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(WEBHOOK_WORKERS)]
+        self._tasks.append(asyncio.create_task(self._sweeper()))
+        logger.info(f"Started webhook dispatcher with {WEBHOOK_WORKERS} workers")
+
+    async def stop(self):
+        # Undelivered notifications stay in the outbox for the next start
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._in_flight.clear()
+        await asyncio.to_thread(self.outbox.close)
+
+    async def enqueue(self, url: str, payload: Dict[str, Any], order_key: Optional[str] = None) -> bool:
+        """
+        Persist a notification and schedule delivery without waiting for it.
+        Notifications with the same order_key are delivered one after another, in enqueue order.
+        """
+        try:
+            delivery_id, claimed = await asyncio.to_thread(self.outbox.add, url, payload, order_key)
+        except Exception as e:
+            logger.error(f"Could not persist webhook for {url}: {str(e)}")
+            metrics.inc("webhook_deliveries_total", outcome="dropped")
+            return False
+        metrics.inc("webhook_enqueued_total")
+        if claimed:
+            self._offer((delivery_id, url, payload, 0))
+        return True
+
+    def _offer(self, delivery: Delivery):
+        # A full queue is fine: the row is in the outbox and a sweep picks it up once its lease expires
+        if self._queue is None or delivery[0] in self._in_flight:
+            return
+        try:
+            self._queue.put_nowait(delivery)
+            self._in_flight.add(delivery[0])
+        except asyncio.QueueFull:
+            metrics.inc("webhook_queue_full_total")
+
+    async def _sweeper(self):
+        pruned_at = 0.0
+        while True:
+            try:
+                if time.monotonic() - pruned_at >= PRUNE_INTERVAL_SECONDS:
+                    pruned = await asyncio.to_thread(self.outbox.prune_dead, time.time() - WEBHOOK_DEAD_RETENTION_SECONDS)
+                    pruned_at = time.monotonic()
+                    if pruned:
+                        logger.info(f"Pruned {pruned} dead webhook deliveries")
+                # Only claim what the queue can take right now
+                free = WEBHOOK_QUEUE_MAX - self._queue.qsize()
+                if free > 0:
+                    for delivery in await asyncio.to_thread(self.outbox.claim_due, free):
+                        self._offer(delivery)
+                counts = await asyncio.to_thread(self.outbox.counts)
+                metrics.set_gauge("webhook_outbox_pending", counts.get("pending", 0))
+                metrics.set_gauge("webhook_outbox_dead", counts.get("dead", 0))
+            except Exception as e:
+                logger.error(f"Webhook outbox sweep failed: {str(e)}")
+            await asyncio.sleep(WEBHOOK_SWEEP_INTERVAL_SECONDS)
+
+    def _breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(
+                WEBHOOK_BREAKER_FAILURE_THRESHOLD, WEBHOOK_BREAKER_RESET_SECONDS
+            )
+        return breaker
+
+    def _host_limit(self, host: str) -> asyncio.Semaphore:
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(WEBHOOK_PER_HOST_CONCURRENCY)
+        return limit
+
+    async def _worker(self):
+        while True:
+            delivery = await self._queue.get()
+            try:
+                await self._attempt(delivery)
+            except Exception as e:
+                logger.error(f"Webhook worker error: {str(e)}")
+            finally:
+                self._in_flight.discard(delivery[0])
+                self._queue.task_done()
+
+    async def _attempt(self, delivery: Delivery):
+        delivery_id, url, payload, attempts = delivery
+        host = urlsplit(url).netloc
+        breaker = self._breaker(host)
+        if not breaker.allow():
+            # Receiver is considered down: push the retry past the breaker's cool-down without using an attempt
+            metrics.inc("webhook_deliveries_total", outcome="circuit_open")
+            await asyncio.to_thread(
+                self.outbox.reschedule, delivery_id, attempts,
+                time.time() + breaker.retry_after() + backoff_delay(1), "circuit open"
+            )
+            return
+
+        async with self._host_limit(host):
+            started = time.perf_counter()
+            ok = await self._deliver(url, payload)
+            metrics.observe("webhook_delivery_seconds", time.perf_counter() - started)
+            record_stage("webhook", time.perf_counter() - started)
+
+        if ok:
+            breaker.record_success()
+            metrics.inc("webhook_deliveries_total", outcome="success")
+            await asyncio.to_thread(self.outbox.delete, delivery_id)
+            return
+
+        breaker.record_failure()
+        attempts += 1
+        dead = attempts >= WEBHOOK_MAX_ATTEMPTS
+        metrics.inc("webhook_deliveries_total", outcome="dead" if dead else "retry")
+        if dead:
+            logger.error(f"Giving up on webhook {delivery_id} to {url} after {attempts} attempts")
+        await asyncio.to_thread(
+            self.outbox.reschedule, delivery_id, attempts, time.time() + backoff_delay(attempts), "delivery failed", dead
+        )
@@ -3,12 +3,19 @@ import asyncio
 import logging
 from typing import Optional, Dict, Any
 from app.schemas.nlp_models import WebhookNotification
+from app.services.http_client import upstream_clients
+from app.services.webhook_delivery import WebhookDispatcher
 
 logger = logging.getLogger(__name__)
 
 class WebhookService:
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+        # Notifications are delivered in the background; callers never wait on receivers
+        self.dispatcher = WebhookDispatcher(self._deliver_payload)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return upstream_clients.get("webhook")
     
     async def send_webhook(self, webhook_url: str, notification: WebhookNotification) -> bool:
         """
@@ -32,6 +39,17 @@ class WebhookService:
         except Exception as e:
             logger.error(f"Error sending webhook to {webhook_url}: {str(e)}")
             return False
+
+    async def _deliver_payload(self, webhook_url: str, payload: Dict[str, Any]) -> bool:
+        return await self.send_webhook(webhook_url, WebhookNotification(**payload))
+
+    async def enqueue_notification(self, webhook_url: str, notification: WebhookNotification) -> bool:
+        """
+        Queue a notification for background delivery with retries.
+        Returns True once it is persisted in the outbox, not when it is delivered.
+        """
+        # A task's notifications (processing, then completed/failed) are delivered in order
+        return await self.dispatcher.enqueue(webhook_url, notification.model_dump(), order_key=notification.task_id)
     
     async def send_processing_notification(self, webhook_url: str, task_id: str) -> bool:
         """Send notification that task is being processed."""
@@ -40,7 +58,7 @@ class WebhookService:
             status="processing",
             result=None
         )
-        return await self.send_webhook(webhook_url, notification)
+        return await self.enqueue_notification(webhook_url, notification)
     
     async def send_completion_notification(self, webhook_url: str, task_id: str, result: Any) -> bool:
         """Send notification that task is completed."""
@@ -49,7 +67,7 @@ class WebhookService:
             status="completed",
             result=result
         )
-        return await self.send_webhook(webhook_url, notification)
+        return await self.enqueue_notification(webhook_url, notification)
     
     async def send_error_notification(self, webhook_url: str, task_id: str, error: str) -> bool:
         """Send notification that task failed."""
@@ -58,6 +76,6 @@ class WebhookService:
             status="failed",
             error=error
         )
-        return await self.send_webhook(webhook_url, notification)
+        return await self.enqueue_notification(webhook_url, notification)
 
 webhook_service = WebhookService() 
\ No newline at end of file
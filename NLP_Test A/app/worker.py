@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import logging
+from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
+from app.config import CELERY_BROKER_URL
+from app.services.http_client import upstream_clients
+from app.services.job_queue import run_job
+from app.services.task_store import task_store
+from app.services.webhook_service import webhook_service
+
+logger = logging.getLogger(__name__)
+
+# Run with: celery -A app.worker worker --concurrency=8 --loglevel=info
+# Worker concurrency is set on the worker command line, independently of the API processes.
+celery_app = Celery("nlp_worker", broker=CELERY_BROKER_URL)
+celery_app.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    # Status and results live in the task store, not in a Celery result backend
+    task_ignore_result=True,
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+)
+
+# One event loop per worker process, running in a background thread. Pooled HTTP and Redis
+# clients are reused across tasks, and webhook deliveries keep flowing between tasks.
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="worker-loop", daemon=True)
+            _loop_thread.start()
+            asyncio.run_coroutine_threadsafe(_start_services(), _loop).result()
+        return _loop
+
+
+async def _start_services():
+    await upstream_clients.start()
+    await webhook_service.dispatcher.start()
+
+
+async def _stop_services():
+    await webhook_service.dispatcher.stop()
+    await upstream_clients.close()
+    await task_store.close()
+
+
+@worker_process_init.connect
+def _init_worker_process(**kwargs):
+    _get_loop()
+
+
+@worker_process_shutdown.connect
+def _shutdown_worker_process(**kwargs):
+    if _loop is None or _loop.is_closed():
+        return
+    asyncio.run_coroutine_threadsafe(_stop_services(), _loop).result()
+    _loop.call_soon_threadsafe(_loop.stop)
+    _loop_thread.join()
+    _loop.close()
+
+
+@celery_app.task(name="nlp.run_task")
+def run_nlp_task(task_type: str, request_data: dict, task_id: str):
+    asyncio.run_coroutine_threadsafe(run_job(task_type, request_data, task_id), _get_loop()).result()
@@ -0,0 +1,136 @@
+"""
+Microbenchmarks for ingestion and similarity search through the service's AsyncVectorStore,
+at several corpus sizes (default 1k, 10k and 100k documents). Embeddings are generated
+locally and deterministically, so the numbers measure the store and not the embedding API.
+Writes a JSON report.
+
+    python benchmarks/bench_ingest_search.py --backends numpy,chroma --sizes 1000,10000,100000
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import INGEST_BATCH_SIZE  # noqa: E402
+from app.rag.vector_store import AsyncVectorStore  # noqa: E402
+from app.rag.numpy_index import NumpyVectorIndex  # noqa: E402
+
+
+def make_embeddings(count: int, dim: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def open_backend(backend: str, path: str):
+    if backend == "chroma":
+        import chromadb
+        return chromadb.PersistentClient(path=path).get_or_create_collection("bench")
+    if backend.startswith("numpy"):
+        dtype = backend.split("-", 1)[1] if "-" in backend else "float32"
+        return NumpyVectorIndex(path, dtype=dtype)
+    raise SystemExit(f"Unknown backend {backend}")
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "p95": round(float(np.percentile(latencies, 95)) * 1000, 3),
+        "p99": round(float(np.percentile(latencies, 99)) * 1000, 3),
+    }
+
+
+async def bench_one(backend: str, size: int, args) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="bench_is_")
+    store = AsyncVectorStore(open_backend(backend, workdir))
+    try:
+        vectors = make_embeddings(size, args.dim, args.seed)
+        ids = [f"doc_{i}" for i in range(size)]
+        texts = [f"document {i}" for i in range(size)]
+
+        # Ingestion: batched upserts with the same batch size and concurrency as the service
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def upsert(start: int):
+            async with semaphore:
+                stop = start + args.batch_size
+                await store.upsert(ids=ids[start:stop], embeddings=vectors[start:stop].tolist(), documents=texts[start:stop])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(upsert(start) for start in range(0, size, args.batch_size)))
+        await store.flush()
+        ingest_seconds = time.perf_counter() - started
+
+        # Search: sequential latency, then throughput with concurrent queries
+        queries = make_embeddings(args.queries, args.dim, args.seed + 1).tolist()
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            await store.query(query_embeddings=[query], n_results=args.k)
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(store.query(query_embeddings=[query], n_results=args.k) for query in queries))
+        concurrent_seconds = time.perf_counter() - started
+
+        return {
+            "backend": backend,
+            "docs": size,
+            "ingest_seconds": round(ingest_seconds, 3),
+            "ingest_docs_per_second": round(size / ingest_seconds, 1),
+            "search_latency_ms": latency_summary(latencies),
+            "search_qps_concurrent": round(len(queries) / concurrent_seconds, 1),
+        }
+    finally:
+        store.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def main_async(args) -> Dict[str, Any]:
+    results = []
+    for backend in args.backends.split(","):
+        for size in (int(size) for size in args.sizes.split(",")):
+            print(f"Running {backend} at {size} docs...", file=sys.stderr)
+            try:
+                results.append(await bench_one(backend, size, args))
+            except ImportError as e:
+                print(f"Skipping {backend}: {str(e)}", file=sys.stderr)
+                break
+    return {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="numpy,chroma")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=15, help="Candidates per query (top_k x rerank overfetch)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    output = json.dumps(asyncio.run(main_async(args)), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Compare vector store backends on synthetic embeddings: recall@k against exact search,
+query latency and ingest time. Writes a JSON report.
+
+    python benchmarks/bench_vector_store.py --docs 10000 --dim 1024 --queries 200
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.rag.numpy_index import NumpyVectorIndex  # noqa: E402
+
+
+def make_corpus(docs: int, dim: int, clusters: int, seed: int):
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    labels = rng.integers(0, clusters, size=docs)
+    vectors = centers[labels] + 0.5 * rng.normal(size=(docs, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> List[List[int]]:
+    scores = queries @ corpus.T
+    return [list(np.argsort(-row)[:k]) for row in scores]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    return round(float(np.percentile(values, pct)) * 1000, 3) if values else 0.0
+
+
+def run_backend(name: str, collection, corpus: np.ndarray, queries: np.ndarray, truth: List[List[int]],
+                k: int, batch_size: int) -> Dict:
+    ids = [f"doc_{i}" for i in range(len(corpus))]
+    started = time.perf_counter()
+    for start in range(0, len(corpus), batch_size):
+        stop = start + batch_size
+        collection.upsert(
+            ids=ids[start:stop],
+            embeddings=corpus[start:stop].tolist(),
+            documents=ids[start:stop],
+        )
+    if hasattr(collection, "flush"):
+        collection.flush()
+    ingest_seconds = time.perf_counter() - started
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+        latencies.append(time.perf_counter() - started)
+        found = {int(doc_id.split("_")[1]) for doc_id in result["ids"][0]}
+        hits += len(found & set(expected))
+
+    return {
+        "backend": name,
+        "ingest_seconds": round(ingest_seconds, 3),
+        "recall_at_k": round(hits / (len(queries) * k), 4),
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": round(float(np.mean(latencies)) * 1000, 3),
+        },
+    }
+
+
+def open_chroma(path: str):
+    import chromadb
+    client = chromadb.PersistentClient(path=path)
+    # Cosine space, to compare like with like
+    return client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backends", default="chroma,numpy-float32,numpy-float16,numpy-int8")
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.docs + args.queries, args.dim, args.clusters, args.seed)
+    corpus, queries = corpus[:args.docs], corpus[args.docs:]
+    truth = exact_top_k(corpus, queries, args.k)
+
+    results = []
+    for backend in args.backends.split(","):
+        workdir = tempfile.mkdtemp(prefix="bench_vs_")
+        try:
+            if backend == "chroma":
+                try:
+                    collection = open_chroma(workdir)
+                except ImportError:
+                    print("chromadb is not installed, skipping", file=sys.stderr)
+                    continue
+            elif backend.startswith("numpy-"):
+                collection = NumpyVectorIndex(workdir, dtype=backend.split("-", 1)[1])
+            else:
+                raise SystemExit(f"Unknown backend {backend}")
+            print(f"Running {backend}...", file=sys.stderr)
+            results.append(run_backend(backend, collection, corpus, queries, truth, args.k, args.batch_size))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Local stand-in for the LLM, embedding and reranker APIs, for load tests and benchmarks.
+
+Implements the contracts the service uses under /usf/v1:
+    POST /usf/v1/hiring/chat/completions   (plain and "stream": true SSE)
+    POST /usf/v1/hiring/embed/embeddings
+    POST /usf/v1/hiring/embed/reranker
+plus GET /stats (call counters), POST /stats/reset and POST /config (change latency/errors at runtime).
+
+Embeddings are deterministic: hashed word vectors summed and normalized, so texts sharing
+words are close. Run it and point the service at it:
+
+    python benchmarks/fake_upstream.py --port 9000 --llm-latency-ms 400 --tail-prob 0.02
+    LLM_API_URL=http://localhost:9000/usf/v1/hiring/chat/completions \\
+    USF_API_URL=http://localhost:9000/usf/v1 python main.py
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from collections import Counter
+from typing import Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBEDDING_DIM = 256
+WORD_RE = re.compile(r"\w+")
+
+app = FastAPI(title="Fake upstream")
+calls: Counter = Counter()
+
+# Per-endpoint latency model: lognormal around the median, plus an occasional slow tail
+settings: Dict[str, Dict[str, float]] = {
+    "llm": {"latency_ms": 300.0, "sigma": 0.3, "tail_prob": 0.0, "tail_ms": 3000.0, "error_rate": 0.0},
+    "embedding": {"latency_ms": 20.0, "sigma": 0.3, "tail_prob": 0.0, "tail_ms": 500.0, "error_rate": 0.0},
+    "rerank": {"latency_ms": 30.0, "sigma": 0.3, "tail_prob": 0.0, "tail_ms": 500.0, "error_rate": 0.0},
+}
+stream_token_ms = 10.0
+
+
+def tokens(text: str) -> List[str]:
+    return WORD_RE.findall(text.lower())
+
+
+def _word_vector(word: str, dim: int) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(word.encode("utf-8")).digest()[:8], "little")
+    rng = random.Random(seed)
+    return [rng.gauss(0.0, 1.0) for _ in range(dim)]
+
+
+def deterministic_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """Same text, same vector; texts sharing words get similar vectors."""
+    vector = [0.0] * dim
+    for word in tokens(text) or [text]:
+        for i, value in enumerate(_word_vector(word, dim)):
+            vector[i] += value
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def overlap_score(query: str, text: str) -> float:
+    query_words, text_words = set(tokens(query)), set(tokens(text))
+    if not query_words or not text_words:
+        return 0.0
+    return len(query_words & text_words) / len(query_words | text_words)
+
+
+async def simulate(endpoint: str) -> bool:
+    """Sleep for a sampled latency; returns False when this call should fail."""
+    calls[endpoint] += 1
+    config = settings[endpoint]
+    if random.random() < config["tail_prob"]:
+        delay_ms = config["tail_ms"]
+    else:
+        delay_ms = config["latency_ms"] * math.exp(random.gauss(0.0, config["sigma"]))
+    await asyncio.sleep(delay_ms / 1000)
+    return random.random() >= config["error_rate"]
+
+
+def error_response() -> JSONResponse:
+    return JSONResponse(status_code=503, content={"error": "injected failure"})
+
+
+def completion_text(messages: List[Dict]) -> str:
+    prompt = " ".join(str(m.get("content", "")) for m in messages)
+    if "Reply with only 'yes' or 'no'" in prompt:
+        return "yes" if re.search(r"learning|neural|agent|model", prompt.lower()) else "no"
+    words = tokens(prompt)
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+    if "Reply with only a JSON object" in prompt:
+        # Multi-task prompt: one string field per requested task
+        return json.dumps({key: f"[fake {key} {digest}]" for key in re.findall(r'^- "(\w+)":', prompt, re.M)})
+    return f"[fake {digest}] " + " ".join(words[:40])
+
+
+@app.post("/usf/v1/hiring/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if not await simulate("llm"):
+        return error_response()
+    content = completion_text(body.get("messages", []))
+    if not body.get("stream"):
+        return {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+
+    async def events():
+        for word in content.split(" "):
+            await asyncio.sleep(stream_token_ms / 1000)
+            chunk = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/usf/v1/hiring/embed/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    if not await simulate("embedding"):
+        return error_response()
+    texts = body.get("input", [])
+    if isinstance(texts, str):
+        texts = [texts]
+    calls["embedding_texts"] += len(texts)
+    return {"result": {"data": [
+        {"index": i, "embedding": deterministic_embedding(text)} for i, text in enumerate(texts)
+    ]}}
+
+
+@app.post("/usf/v1/hiring/embed/reranker")
+async def reranker(request: Request):
+    body = await request.json()
+    if not await simulate("rerank"):
+        return error_response()
+    query, texts = body.get("query", ""), body.get("texts", [])
+    calls["rerank_texts"] += len(texts)
+    return {"result": {"data": [
+        {"index": i, "text": text, "score": overlap_score(query, text)} for i, text in enumerate(texts)
+    ]}}
+
+
+@app.get("/stats")
+async def stats():
+    return {"calls": dict(calls), "settings": settings, "time": time.time()}
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    calls.clear()
+    return {"status": "reset"}
+
+
+@app.post("/config")
+async def update_config(request: Request):
+    """Body like {"llm": {"latency_ms": 800, "error_rate": 0.05}}."""
+    body = await request.json()
+    for endpoint, values in body.items():
+        if endpoint in settings:
+            settings[endpoint].update({key: float(value) for key, value in values.items() if key in settings[endpoint]})
+    return settings
+
+
+def main():
+    global stream_token_ms
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--llm-latency-ms", type=float, default=settings["llm"]["latency_ms"])
+    parser.add_argument("--embedding-latency-ms", type=float, default=settings["embedding"]["latency_ms"])
+    parser.add_argument("--rerank-latency-ms", type=float, default=settings["rerank"]["latency_ms"])
+    parser.add_argument("--sigma", type=float, default=0.3, help="Lognormal spread of latencies")
+    parser.add_argument("--tail-prob", type=float, default=0.0, help="Probability of a slow-tail response")
+    parser.add_argument("--tail-ms", type=float, default=None, help="Slow-tail latency (default: per endpoint)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stream-token-ms", type=float, default=stream_token_ms)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    stream_token_ms = args.stream_token_ms
+    for endpoint in settings:
+        settings[endpoint].update({
+            "latency_ms": getattr(args, f"{endpoint}_latency_ms"),
+            "sigma": args.sigma,
+            "tail_prob": args.tail_prob,
+            "error_rate": args.error_rate,
+        })
+        if args.tail_ms is not None:
+            settings[endpoint]["tail_ms"] = args.tail_ms
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Load generator for the /nlp and /rag endpoints. Runs at a fixed request rate (open loop)
+or a fixed concurrency (closed loop) and reports latency percentiles, throughput, status
+codes and, with --upstream-url pointing at benchmarks/fake_upstream.py, upstream calls per
+request. Writes a JSON report.
+
+    python benchmarks/load_test.py --scenario classify,summarize --concurrency 32 --duration 30
+    python benchmarks/load_test.py --scenario rag-stats --rps 200 --duration 20 --output run.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+SAMPLE_TEXTS = [
+    "Deep learning models learn hierarchical representations from raw data.",
+    "The quarterly earnings beat expectations and the stock rallied.",
+    "Agentic AI systems plan, call tools and reflect on their own outputs.",
+    "I loved the new cafe downtown, the coffee was excellent.",
+    "Gradient descent minimizes the loss by following the negative gradient.",
+    "Barack Obama visited Berlin and met Angela Merkel in 2013.",
+    "Transformers use self-attention to model long-range dependencies.",
+    "The flight was delayed for five hours and nobody told us why.",
+    "Reinforcement learning agents maximize cumulative reward.",
+    "Machine learning pipelines need monitoring for data drift.",
+]
+
+Scenario = Tuple[str, str, Callable[[random.Random], Optional[Dict[str, Any]]]]
+
+
+def _text_body(rng: random.Random) -> Dict[str, Any]:
+    return {"text": rng.choice(SAMPLE_TEXTS)}
+
+
+def _list_body(rng: random.Random) -> Dict[str, Any]:
+    return {"text": rng.sample(SAMPLE_TEXTS, 4)}
+
+
+def _documents_body(rng: random.Random) -> Dict[str, Any]:
+    doc_id = f"load-{rng.randrange(10 ** 9)}"
+    return {"documents": [{"id": doc_id, "text": rng.choice(SAMPLE_TEXTS)}]}
+
+
+def _query_body(rng: random.Random) -> Dict[str, Any]:
+    return {"query": rng.choice(SAMPLE_TEXTS), "top_k": 3}
+
+
+def _query_batch_body(rng: random.Random) -> Dict[str, Any]:
+    return {"queries": rng.sample(SAMPLE_TEXTS, 8), "top_k": 3}
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "classify": ("POST", "/nlp/classify", _text_body),
+    "entities": ("POST", "/nlp/entities", _text_body),
+    "summarize": ("POST", "/nlp/summarize", _text_body),
+    "sentiment": ("POST", "/nlp/sentiment", _text_body),
+    "classify-batch": ("POST", "/nlp/classify", _list_body),
+    "analyze": ("POST", "/nlp/analyze", _text_body),
+    "rag-add": ("POST", "/rag/documents/add", _documents_body),
+    "rag-query": ("POST", "/rag/query", _query_body),
+    "rag-query-batch": ("POST", "/rag/query/batch", _query_batch_body),
+    "rag-stats": ("GET", "/rag/documents/stats", lambda rng: None),
+    "rag-list": ("GET", "/rag/documents/list?limit=50", lambda rng: None),
+}
+
+
+def percentile_ms(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 2)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, scenario: str, latency: float, status: str):
+        self.latencies[scenario].append(latency)
+        self.statuses[scenario][status] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        def describe(latencies: List[float], statuses: Counter) -> Dict[str, Any]:
+            ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+            return {
+                "requests": len(latencies),
+                "ok": ok,
+                "errors": len(latencies) - ok,
+                "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+                "latency_ms": {
+                    "p50": percentile_ms(latencies, 50),
+                    "p95": percentile_ms(latencies, 95),
+                    "p99": percentile_ms(latencies, 99),
+                    "max": percentile_ms(latencies, 100),
+                },
+                "status_codes": dict(statuses),
+            }
+
+        every = [latency for values in self.latencies.values() for latency in values]
+        all_statuses = sum(self.statuses.values(), Counter())
+        return {
+            "overall": describe(every, all_statuses),
+            "by_scenario": {name: describe(values, self.statuses[name]) for name, values in self.latencies.items()},
+        }
+
+
+async def send(client: httpx.AsyncClient, rng: random.Random, names: List[str], recorder: Recorder):
+    name = rng.choice(names)
+    method, path, body_factory = SCENARIOS[name]
+    body = body_factory(rng)
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, path, json=body)
+        status = str(response.status_code)
+    except httpx.TimeoutException:
+        status = "timeout"
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    recorder.record(name, time.perf_counter() - started, status)
+
+
+async def run_closed_loop(client, rng, names, recorder, concurrency: int, ends_at: float, max_requests: Optional[int]):
+    sent = 0
+
+    async def worker():
+        nonlocal sent
+        while time.perf_counter() < ends_at and (max_requests is None or sent < max_requests):
+            sent += 1
+            await send(client, rng, names, recorder)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def run_open_loop(client, rng, names, recorder, rps: float, ends_at: float, max_requests: Optional[int]):
+    """Requests start on schedule whether or not earlier ones finished, so queueing shows up as latency."""
+    in_flight = set()
+    interval = 1.0 / rps
+    next_at = time.perf_counter()
+    sent = 0
+    while next_at < ends_at and (max_requests is None or sent < max_requests):
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        task = asyncio.create_task(send(client, rng, names, recorder))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        sent += 1
+        next_at += interval
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+async def upstream_calls(upstream_url: Optional[str]) -> Optional[Dict[str, int]]:
+    if not upstream_url:
+        return None
+    async with httpx.AsyncClient(base_url=upstream_url, timeout=5.0) as client:
+        return (await client.get("/stats")).json()["calls"]
+
+
+async def main_async(args) -> Dict[str, Any]:
+    names = args.scenario.split(",")
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s) {unknown}, choose from {sorted(SCENARIOS)}")
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=max(args.concurrency, 100), max_keepalive_connections=max(args.concurrency, 100))
+    headers = {"X-Request-Priority": args.priority} if args.priority else None
+
+    before = await upstream_calls(args.upstream_url)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits, headers=headers) as client:
+        started = time.perf_counter()
+        ends_at = started + args.duration
+        if args.rps:
+            await run_open_loop(client, rng, names, recorder, args.rps, ends_at, args.requests)
+        else:
+            await run_closed_loop(client, rng, names, recorder, args.concurrency, ends_at, args.requests)
+        elapsed = time.perf_counter() - started
+    after = await upstream_calls(args.upstream_url)
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "elapsed_seconds": round(elapsed, 3),
+        **recorder.summary(elapsed),
+    }
+    if before is not None and after is not None:
+        total = report["overall"]["requests"] or 1
+        delta = {key: after.get(key, 0) - before.get(key, 0) for key in after}
+        report["upstream_calls"] = delta
+        report["upstream_calls_per_request"] = {key: round(value / total, 3) for key, value in delta.items()}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--upstream-url", default=None, help="Fake upstream base URL, for upstream call counts")
+    parser.add_argument("--scenario", default="classify,entities,summarize,sentiment",
+                        help=f"Comma-separated mix of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--rps", type=float, default=None, help="Fixed request rate (open loop)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients when --rps is not set")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--requests", type=int, default=None, help="Stop after this many requests")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--priority", default=None, help="X-Request-Priority header (e.g. batch) for admission control")
+    parser.add_argument("--output", default=None, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        overall = report["overall"]
+        print(f"{overall['requests']} requests, {overall['throughput_rps']} rps, p99 {overall['latency_ms']['p99']} ms",
+              file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
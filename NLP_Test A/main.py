@@ -1,17 +1,52 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 import uvicorn
 
 from app.api.routes_nlp import router as nlp_router
 from app.rag.routes import router as rag_router
+from app.services.http_client import upstream_clients
+from app.services.metrics import metrics
+from app.services.tracing import ServerTimingMiddleware
+from app.services.admission import AdmissionMiddleware
+from app.rag.document_ingestion import document_ingestion_service
+from app.services.task_store import task_store
+from app.services.webhook_service import webhook_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the pooled upstream clients once per worker and close them on shutdown
+    await upstream_clients.start()
+    await webhook_service.dispatcher.start()
+    # One-off migration of documents stored before listing had an id index (first process only)
+    await document_ingestion_service.backfill_id_index()
+    try:
+        yield
+    finally:
+        await webhook_service.dispatcher.stop()
+        await upstream_clients.close()
+        await task_store.close()
+        await document_ingestion_service.store.flush()
+        document_ingestion_service.store.shutdown()
+        document_ingestion_service.id_index.close()
 
 # Create the main FastAPI app
 app = FastAPI(
     title="NLP and RAG API",
     description="A simple API for Natural Language Processing and Retrieval-Augmented Generation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 
+# Bounded, priority-ordered admission for POST /nlp/* and /rag/*; sheds with 503/429 + Retry-After
+app.add_middleware(AdmissionMiddleware)
+
+# Per-stage timings in a Server-Timing header and in the stage_duration_seconds histograms
+# (added last so it is outermost and also times the admission queue and shed responses)
+app.add_middleware(ServerTimingMiddleware)
+
 # Include the NLP routes with prefix
 app.include_router(nlp_router, prefix="/nlp", tags=["NLP"])
 
@@ -27,6 +62,13 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "NLP and RAG API"}
 
+@app.get("/metrics")
+async def get_metrics(format: str = "prometheus"):
+    """Prometheus text format by default; ?format=json for the JSON snapshot."""
+    if format == "json":
+        return metrics.snapshot()
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Run the application
 if __name__ == "__main__":
     uvicorn.run(
@@ -0,0 +1,7 @@
+import os
+
+# In-process stand-ins for the Celery broker and the Redis task store; read when app.config is imported
+os.environ.setdefault("JOB_QUEUE_BACKEND", "local")
+os.environ.setdefault("TASK_STORE_BACKEND", "memory")
+# Keep the tests off the on-disk Chroma collection
+os.environ.setdefault("VECTOR_STORE_BACKEND", "numpy")
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+def _controller(queue_max: int = 4, max_wait: float = 5.0) -> AdmissionController:
+    """One slot, so every other arrival queues."""
+    return AdmissionController(
+        max_concurrent=1,
+        queue_max=queue_max,
+        max_wait={"interactive": max_wait, "batch": max_wait, "background": None},
+        enabled=True,
+    )
+
+
+def test_cancel_while_queued_gives_up_place():
+    controller = _controller()
+
+    async def run():
+        await controller.acquire("interactive")
+        waiter = asyncio.create_task(controller.acquire("batch"))
+        await asyncio.sleep(0)
+        assert controller.queue_length("batch") == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert controller.queue_length("batch") == 0
+        # The freed slot is not handed to the cancelled waiter
+        controller.release(0.0)
+        assert controller.in_flight == 0
+        await controller.acquire("batch")
+
+    asyncio.run(run())
+    assert controller.in_flight == 1
+
+
+def test_timeout_racing_hand_off_passes_slot_on():
+    controller = _controller(max_wait=0.05)
+
+    async def run():
+        await controller.acquire("interactive")
+        racer = asyncio.create_task(controller.acquire("batch"))
+        behind = asyncio.create_task(controller.acquire("background"))
+        await asyncio.sleep(0)
+        # The slot is handed to the batch waiter just after its wait timed out
+        asyncio.get_running_loop().call_later(0.06, controller.release, 0.0)
+        time.sleep(0.1)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await racer
+        assert rejected.value.reason == "timeout"
+        await asyncio.wait_for(behind, 1)
+        assert controller.in_flight == 1
+        assert controller.queue_length("background") == 0
+
+    asyncio.run(run())
+
+
+def test_full_queue_displaces_lower_priority_waiter():
+    controller = _controller(queue_max=1)
+
+    async def run():
+        await controller.acquire("interactive")
+        batch = asyncio.create_task(controller.acquire("batch"))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(controller.acquire("interactive"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as displaced:
+            await batch
+        assert (displaced.value.reason, displaced.value.status_code) == ("displaced", 429)
+        assert controller.queue_length() == 1
+
+        # Nothing ranks below a batch arrival now, so it is shed itself
+        with pytest.raises(AdmissionRejected) as shed:
+            await controller.acquire("batch")
+        assert shed.value.reason == "queue_full"
+
+        controller.release(0.0)
+        await interactive
+        assert controller.in_flight == 1
+        assert controller.queue_length() == 0
+
+    asyncio.run(run())
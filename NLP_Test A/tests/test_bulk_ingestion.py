@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.rag import bulk_ingestion, routes
+from app.rag.bulk_ingestion import BulkIngestionService
+
+
+@pytest.fixture
+def upserted(monkeypatch):
+    """Stub the vector store side of ingestion; returns the ids each batch upserted."""
+    batches = []
+
+    async def upsert_documents(documents, metadata=None):
+        batches.append([doc["id"] for doc in documents])
+        return {"upserted": len(documents), "skipped": 0, "embeddings_generated": len(documents)}
+
+    async def flush():
+        pass
+
+    service = bulk_ingestion.document_ingestion_service
+    monkeypatch.setattr(service, "upsert_documents", upsert_documents)
+    monkeypatch.setattr(service.store, "flush", flush)
+    return batches
+
+
+async def _lines(*lines):
+    for line in lines:
+        yield line
+
+
+def test_finished_jobs_leave_memory_but_stay_queryable(upserted):
+    service = BulkIngestionService(batch_size=2, concurrency=2)
+    lines = [json.dumps({"id": f"d{i}", "text": "t"}) for i in range(5)] + ["not json", '{"id": "x"}']
+
+    async def run():
+        job = await service.ingest(_lines(*lines), job_id="bulk-job-1")
+        return job, await service.get_job("bulk-job-1")
+
+    job, report = asyncio.run(run())
+    assert service.jobs == {}
+    assert sorted(sum(upserted, [])) == ["d0", "d1", "d2", "d3", "d4"]
+    assert report["status"] == job.status == "completed_with_errors"
+    assert report["job_id"] == "bulk-job-1"
+    assert (report["received"], report["upserted"], report["failed"]) == (5, 5, 2)
+    assert len(report["errors"]) == 2
+
+
+def test_unknown_job_is_none():
+    assert asyncio.run(BulkIngestionService().get_job("bulk-missing")) is None
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(routes.router, prefix="/rag")
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("payload", [{"documents": {"id": "a"}}, {"other": []}, "just a string"])
+def test_json_upload_must_hold_a_document_list(client, payload):
+    response = client.post("/rag/documents/bulk/upload", files={"file": ("docs.json", json.dumps(payload))})
+    assert response.status_code == 400
+
+
+def test_json_upload_size_is_capped(client, monkeypatch):
+    monkeypatch.setattr(routes, "BULK_UPLOAD_MAX_JSON_BYTES", 10)
+    response = client.post("/rag/documents/bulk/upload", files={"file": ("docs.json", json.dumps({"documents": []}) + " " * 20)})
+    assert response.status_code == 413
+
+
+def test_json_upload_ingests_documents_and_reports_progress(client, upserted):
+    body = json.dumps({"documents": [{"id": "a", "text": "x"}, {"id": "b", "text": "y"}]})
+    response = client.post("/rag/documents/bulk/upload?job_id=bulk-upload-1", files={"file": ("docs.json", body)})
+    assert response.status_code == 200
+    assert response.json()["upserted"] == 2
+    progress = client.get("/rag/documents/bulk/bulk-upload-1")
+    assert progress.status_code == 200
+    assert progress.json()["status"] == "completed"
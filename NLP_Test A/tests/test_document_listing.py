@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.rag import document_ingestion
+from app.rag.document_id_index import DocumentIdIndex
+from app.rag.document_ingestion import DocumentIngestionService
+from app.rag.numpy_index import NumpyVectorIndex
+from app.rag.vector_store import AsyncVectorStore
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    async def get_embeddings(texts):
+        return {"result": {"data": [{"embedding": [1.0, float(len(text))]} for text in texts]}}
+
+    monkeypatch.setattr(document_ingestion, "get_embeddings", get_embeddings)
+    monkeypatch.setattr(document_ingestion, "open_collection", lambda: NumpyVectorIndex(str(tmp_path / "index")))
+    service = DocumentIngestionService()
+    service.id_index = DocumentIdIndex(str(tmp_path / "ids.db"))
+    yield service
+    service.id_index.close()
+    service.store.shutdown()
+
+
+async def _list_all(service, limit, between_pages=None):
+    seen, cursor = [], None
+    while True:
+        page = await service.list_documents(limit=limit, cursor=cursor)
+        seen += page["document_ids"]
+        if between_pages:
+            await between_pages()
+            between_pages = None
+        cursor = page["next_cursor"]
+        if not cursor:
+            return seen
+
+
+def test_pages_cover_every_document_once_in_id_order(service):
+    async def run():
+        # Upsert order differs from id order
+        await service.upsert_documents([{"id": doc_id, "text": doc_id} for doc_id in ["d5", "d1", "d2", "d3", "d4"]])
+        return await _list_all(service, limit=2)
+
+    assert asyncio.run(run()) == ["d1", "d2", "d3", "d4", "d5"]
+
+
+def test_documents_added_while_paging_are_not_skipped_or_repeated(service):
+    async def run():
+        await service.upsert_documents([{"id": f"d{i}", "text": "x" * i} for i in range(1, 7)])
+
+        async def add_more():
+            await service.upsert_documents([{"id": "d0", "text": "before"}, {"id": "d9", "text": "after"}])
+
+        return await _list_all(service, limit=2, between_pages=add_more)
+
+    seen = asyncio.run(run())
+    assert len(seen) == len(set(seen))
+    # d0 sorts before the cursor, so it shows up on the next full listing only
+    assert seen == ["d1", "d2", "d3", "d4", "d5", "d6", "d9"]
+
+
+def test_exact_page_boundary_has_no_next_cursor(service):
+    async def run():
+        await service.upsert_documents([{"id": "a", "text": "a"}, {"id": "b", "text": "bb"}])
+        return await service.list_documents(limit=2)
+
+    assert asyncio.run(run()) == {"document_ids": ["a", "b"], "next_cursor": None}
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "eyJ4IjogMX0=", "WzFd"])
+def test_invalid_cursor_is_rejected(service, cursor):
+    with pytest.raises(ValueError):
+        asyncio.run(service.list_documents(cursor=cursor))
+
+
+def test_backfill_indexes_existing_documents_once(service, tmp_path):
+    # Documents stored before the id index existed
+    service.collection.upsert(ids=["z", "y", "x"], embeddings=[[1, 0], [0, 1], [1, 1]], documents=["z", "y", "x"])
+
+    async def run():
+        await service.backfill_id_index()
+        return await _list_all(service, limit=10)
+
+    assert asyncio.run(run()) == ["x", "y", "z"]
+    # Another process starting later finds the migration done
+    assert not DocumentIdIndex(str(tmp_path / "ids.db")).claim_backfill()
+
+
+def test_only_one_process_claims_the_backfill(tmp_path):
+    first, second = DocumentIdIndex(str(tmp_path / "ids.db")), DocumentIdIndex(str(tmp_path / "ids.db"))
+    assert first.claim_backfill()
+    assert not second.claim_backfill()
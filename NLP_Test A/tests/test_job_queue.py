@@ -0,0 +1,156 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+from app.schemas.nlp_models import FlexibleTextRequest
+from app.services import job_queue as job_queue_module
+from app.services.job_queue import JobQueue
+from app.services import task_store as task_store_module
+from app.services.task_store import TaskStore, task_store
+from app.services.webhook_service import webhook_service
+
+
+class FakePlan:
+    def describe(self):
+        return {"task_type": "summarize"}
+
+
+@pytest.fixture
+def statuses(monkeypatch):
+    """Every status written to the task store, in order."""
+    seen = []
+    original_set = task_store.set
+
+    async def recording_set(task_id, status, **fields):
+        seen.append((task_id, status))
+        return await original_set(task_id, status, **fields)
+
+    monkeypatch.setattr(task_store, "set", recording_set)
+    return seen
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    async def execute_request(req, task_type):
+        if req.text == "boom":
+            raise RuntimeError("upstream down")
+        return [f"{task_type}: {req.text}"], FakePlan()
+
+    monkeypatch.setattr(job_queue_module, "execute_request", execute_request)
+
+
+async def _drain(queue: JobQueue):
+    while queue._local_jobs:
+        await asyncio.gather(*queue._local_jobs)
+
+
+def test_backends_come_from_environment():
+    assert JobQueue().backend == "local"
+    assert TaskStore().backend == "memory"
+
+
+def test_enqueue_records_queued_processing_completed(statuses, fake_pipeline):
+    queue = JobQueue(backend="local")
+
+    async def run():
+        task_id = await queue.enqueue(FlexibleTextRequest(text="hello", task_id="job-ok"), "summarize")
+        assert (await task_store.get(task_id))["status"] in ("queued", "processing", "completed")
+        await _drain(queue)
+        return task_id, await task_store.get(task_id)
+
+    task_id, record = asyncio.run(run())
+    assert task_id == "job-ok"
+    assert [status for tid, status in statuses if tid == task_id] == ["queued", "processing", "completed"]
+    assert record["task_type"] == "summarize"
+    assert record["result"] == ["summarize: hello"]
+    assert "plan" not in record
+
+
+def test_enqueue_generates_task_id_and_records_failure(statuses, fake_pipeline):
+    queue = JobQueue(backend="local")
+
+    async def run():
+        task_id = await queue.enqueue(FlexibleTextRequest(text="boom"), "classify")
+        await _drain(queue)
+        return task_id, await task_store.get(task_id)
+
+    task_id, record = asyncio.run(run())
+    assert task_id
+    assert [status for tid, status in statuses if tid == task_id] == ["queued", "processing", "failed"]
+    assert record["error"] == "upstream down"
+    assert "result" not in record
+
+
+def test_debug_request_stores_plan(fake_pipeline):
+    queue = JobQueue(backend="local")
+
+    async def run():
+        task_id = await queue.enqueue(FlexibleTextRequest(text="hi", task_id="job-debug", debug=True), "summarize")
+        await _drain(queue)
+        return await task_store.get(task_id)
+
+    assert asyncio.run(run())["plan"] == {"task_type": "summarize"}
+
+
+def test_results_load_after_worker_restart(tmp_path, monkeypatch, fake_pipeline):
+    worker = pytest.importorskip("app.worker")
+    monkeypatch.setattr(webhook_service.dispatcher.outbox, "path", str(tmp_path / "outbox.db"))
+    request_data = FlexibleTextRequest(text="first").model_dump(mode="json")
+
+    try:
+        worker.run_nlp_task("summarize", request_data, "job-before-restart")
+        first_loop = worker._get_loop()
+        worker._shutdown_worker_process()
+        assert first_loop.is_closed()
+
+        # A fresh worker loop still sees what the previous one stored, and keeps working
+        assert asyncio.run(task_store.get("job-before-restart"))["result"] == ["summarize: first"]
+        worker.run_nlp_task("summarize", {**request_data, "text": "second"}, "job-after-restart")
+        assert worker._get_loop() is not first_loop
+        assert asyncio.run(task_store.get("job-after-restart"))["status"] == "completed"
+    finally:
+        worker._shutdown_worker_process()
+
+
+def test_memory_store_expires_records():
+    store = TaskStore(backend="memory", ttl=-1)
+
+    async def run():
+        await store.set("job-expired", "completed", result="x")
+        return await store.get("job-expired")
+
+    assert asyncio.run(run()) is None
+
+
+def test_failed_publish_marks_task_failed(statuses, monkeypatch):
+    def apply_async(*args, **kwargs):
+        raise ConnectionError("broker unreachable")
+
+    fake_worker = types.SimpleNamespace(run_nlp_task=types.SimpleNamespace(apply_async=apply_async))
+    monkeypatch.setitem(sys.modules, "app.worker", fake_worker)
+    queue = JobQueue(backend="celery")
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await queue.enqueue(FlexibleTextRequest(text="hi", task_id="job-unpublished"), "summarize")
+        return await task_store.get("job-unpublished")
+
+    record = asyncio.run(run())
+    assert [status for tid, status in statuses if tid == "job-unpublished"] == ["queued", "failed"]
+    assert record["status"] == "failed"
+    assert "broker unreachable" in record["error"]
+
+
+def test_memory_store_purges_unread_records_on_write(monkeypatch):
+    monkeypatch.setattr(task_store_module, "MEMORY_PURGE_INTERVAL_SECONDS", 0.0)
+    store = TaskStore(backend="memory", ttl=-1)
+
+    async def run():
+        for i in range(3):
+            await store.set(f"job-unread-{i}", "completed", result="x")
+
+    asyncio.run(run())
+    # Each write swept the ones before it, though none was ever read
+    assert list(store._memory) == ["job-unread-2"]
@@ -0,0 +1,97 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.rag.numpy_index import SNAPSHOTS_KEPT, NumpyVectorIndex
+
+
+def _reload(index: NumpyVectorIndex):
+    index._last_reload_check = 0.0
+    return index
+
+
+def _ids(index: NumpyVectorIndex):
+    return sorted(index.get(include=[])["ids"])
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_query_ranks_by_cosine_distance(tmp_path, dtype):
+    index = NumpyVectorIndex(str(tmp_path), dtype=dtype)
+    index.upsert(ids=["x", "y", "xy"], embeddings=[[1, 0], [0, 1], [1, 1]], documents=["x", "y", "xy"])
+    result = index.query(query_embeddings=[[2, 0.1]], n_results=2)
+    assert result["ids"] == [["x", "xy"]]
+    assert result["distances"][0][0] == pytest.approx(0.0, abs=0.01)
+    assert 0.0 < result["distances"][0][1] < 1.0
+
+
+def test_where_filters_support_range_operators(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    index.upsert(ids=["a", "b"], embeddings=[[1, 0], [1, 0]], metadatas=[{"year": 2020}, {"year": 2024}])
+    assert index.get(where={"year": {"$gt": 2021}}, include=[])["ids"] == ["b"]
+    assert index.query(query_embeddings=[[1, 0]], where={"year": {"$lte": 2020}})["ids"] == [["a"]]
+
+
+def test_snapshot_round_trip_and_readers_pick_up_new_versions(tmp_path):
+    writer = NumpyVectorIndex(str(tmp_path))
+    reader = NumpyVectorIndex(str(tmp_path))
+    writer.upsert(ids=["a"], embeddings=[[1, 0]], documents=["doc a"])
+    writer.flush()
+    assert _reload(reader).get(ids=["a"])["documents"] == ["doc a"]
+    assert NumpyVectorIndex(str(tmp_path)).count() == 1
+
+
+def test_published_snapshots_are_never_modified(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    index.upsert(ids=["a"], embeddings=[[1, 0]])
+    index.flush()
+    first = os.path.join(tmp_path, "snapshots", f"{index._version:010d}")
+    index.upsert(ids=["b"], embeddings=[[0, 1]])
+    index.flush()
+    # A reader that resolved CURRENT to the first version still sees a consistent snapshot
+    with open(os.path.join(first, "meta.json"), encoding="utf-8") as f:
+        assert json.load(f)["ids"] == ["a"]
+    assert np.load(os.path.join(first, "embeddings.npy")).shape[0] == 1
+
+
+def test_concurrent_writers_merge_instead_of_overwriting(tmp_path):
+    first = NumpyVectorIndex(str(tmp_path))
+    second = NumpyVectorIndex(str(tmp_path))
+    first.upsert(ids=["a", "shared"], embeddings=[[1, 0], [1, 1]], documents=["a", "from first"])
+    second.upsert(ids=["b", "shared"], embeddings=[[0, 1], [1, 1]], documents=["b", "from second"])
+    first.flush()
+    second.flush()
+    merged = NumpyVectorIndex(str(tmp_path))
+    assert _ids(merged) == ["a", "b", "shared"]
+    # The later flush wins for a document both processes wrote
+    assert merged.get(ids=["shared"])["documents"] == ["from second"]
+
+
+def test_delete_of_a_document_only_another_writer_has(tmp_path):
+    first = NumpyVectorIndex(str(tmp_path))
+    second = NumpyVectorIndex(str(tmp_path))
+    first.upsert(ids=["a", "b"], embeddings=[[1, 0], [0, 1]])
+    first.flush()
+    second.delete(ids=["a"])
+    second.flush()
+    assert _ids(NumpyVectorIndex(str(tmp_path))) == ["b"]
+
+
+def test_old_snapshots_are_pruned(tmp_path):
+    index = NumpyVectorIndex(str(tmp_path))
+    for i in range(SNAPSHOTS_KEPT + 3):
+        index.upsert(ids=[f"d{i}"], embeddings=[[1, i]])
+        index.flush()
+    assert len(os.listdir(os.path.join(tmp_path, "snapshots"))) == SNAPSHOTS_KEPT
+
+
+def test_loads_flat_snapshots_written_before_versioning(tmp_path):
+    np.save(os.path.join(tmp_path, "embeddings.npy"), np.array([[1.0, 0.0]], dtype=np.float32))
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"dtype": "float32", "ids": ["old"], "documents": ["old doc"], "metadatas": [None]}, f)
+    index = NumpyVectorIndex(str(tmp_path))
+    assert index.get(ids=["old"])["documents"] == ["old doc"]
+    index.upsert(ids=["new"], embeddings=[[0, 1]])
+    index.flush()
+    assert _ids(NumpyVectorIndex(str(tmp_path))) == ["new", "old"]
@@ -0,0 +1,68 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services.rate_limit import TokenBucket, UpstreamLimiter
+
+
+def test_cancel_while_waiting_for_slot_frees_nothing_twice():
+    limiter = UpstreamLimiter("test", max_concurrency=1)
+
+    async def run():
+        assert await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+        assert limiter.in_flight == 0
+        assert limiter.try_acquire()
+
+    asyncio.run(run())
+    assert limiter.in_flight == 1
+
+
+def test_timeout_racing_hand_off_passes_slot_on():
+    limiter = UpstreamLimiter("test", max_concurrency=1)
+
+    async def run():
+        assert await limiter.acquire()
+        racer = asyncio.create_task(limiter.acquire(timeout=0.05))
+        behind = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        # The slot is handed to the first waiter just after its wait timed out
+        asyncio.get_running_loop().call_later(0.06, limiter.release)
+        time.sleep(0.1)
+        assert await racer is False
+        assert await asyncio.wait_for(behind, 1) is True
+        assert limiter.in_flight == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_bucket_wait_returns_reservation():
+    bucket = TokenBucket(rate=10.0, burst=1)
+
+    async def run():
+        assert await bucket.acquire()
+        waiter = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        # Only the first token is owed; the cancelled reservation went back
+        assert bucket.wait_time() <= 0.1
+
+    asyncio.run(run())
+
+
+def test_bucket_refuses_waits_longer_than_timeout():
+    bucket = TokenBucket(rate=1.0, burst=1)
+
+    async def run():
+        assert await bucket.acquire(timeout=0)
+        assert await bucket.acquire(timeout=0.1) is False
+
+    asyncio.run(run())
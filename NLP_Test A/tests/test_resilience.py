@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import pytest
+
+from app.services import llm_client
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.resilience import DeadlineExceeded, Upstream, UpstreamUnavailable, deadline_scope, upstreams
+
+
+def _half_open(upstream: Upstream):
+    for _ in range(upstream.breaker.failure_threshold):
+        upstream.breaker.record_failure()
+    upstream.breaker.opened_at = time.monotonic() - upstream.breaker.reset_timeout
+    assert upstream.breaker.state == CircuitBreaker.HALF_OPEN
+
+
+async def _ok(timeout):
+    return "ok"
+
+
+def test_breaker_opens_and_closes_after_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.HALF_OPEN  # reset_timeout 0: straight to a trial
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_expired_deadline_does_not_strand_half_open_trial():
+    upstream = Upstream("llm")
+    _half_open(upstream)
+
+    async def run():
+        with deadline_scope(0):
+            with pytest.raises(DeadlineExceeded):
+                await upstream.call(_ok)
+        return await upstream.call(_ok)
+
+    assert asyncio.run(run()) == "ok"
+    assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_stream_deadline_neither_strands_trial_nor_counts_as_failure(monkeypatch):
+    upstream = Upstream("llm")
+    monkeypatch.setitem(upstreams, "llm", upstream)
+    _half_open(upstream)
+    failures = upstream.breaker.failures
+
+    async def run():
+        with deadline_scope(0):
+            with pytest.raises(llm_client.HTTPException) as error:
+                async for _ in llm_client.stream_llm_api({"messages": []}):
+                    pass
+        return error.value
+
+    assert asyncio.run(run()).status_code == 504
+    assert upstream.breaker.failures == failures
+    assert upstream.breaker.allow()
+
+
+def test_open_breaker_rejects_without_calling():
+    upstream = Upstream("llm")
+    for _ in range(upstream.breaker.failure_threshold):
+        upstream.breaker.record_failure()
+    calls = []
+
+    async def attempt(timeout):
+        calls.append(timeout)
+        return "ok"
+
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(upstream.call(attempt))
+    assert calls == []
+
+
+def test_timeout_defaults_to_upstream_timeout_capped_by_deadline():
+    upstream = Upstream("embedding")
+    assert upstream.timeout(None) == 15.0
+    with deadline_scope(1.0):
+        assert upstream.timeout(None) <= 1.0
+        assert upstream.timeout(0.5) == 0.5
+
+
+def test_slow_call_is_hedged_and_first_answer_wins():
+    upstream = Upstream("embedding", hedge=True)
+    upstream._latencies.extend([0.02] * 50)
+    upstream._calls = 100
+    attempts = []
+
+    async def attempt(timeout):
+        attempts.append(timeout)
+        # The primary hangs; the hedge answers at once
+        if len(attempts) == 1:
+            await asyncio.sleep(10)
+        return f"attempt {len(attempts)}"
+
+    async def run():
+        started = time.monotonic()
+        result = await upstream.call(attempt)
+        return result, time.monotonic() - started
+
+    result, elapsed = asyncio.run(run())
+    assert result == "attempt 2"
+    assert elapsed < 1.0
+    assert upstream._hedges == 1
+    assert upstream.limiter.in_flight == 0
+
+
+def test_cancelled_call_releases_trial():
+    upstream = Upstream("llm")
+    _half_open(upstream)
+
+    async def hang(timeout):
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.create_task(upstream.call(hang))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert upstream.breaker.allow()
+    assert upstream.limiter.in_flight == 0
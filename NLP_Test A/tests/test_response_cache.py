@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+
+from app.services.response_cache import ResponseCache, normalize_text
+
+
+def test_exact_key_collapses_whitespace_but_keeps_case():
+    assert normalize_text("  Apple   makes\nphones ") == "Apple makes phones"
+    cache = ResponseCache(semantic=False)
+    cache.set("entities", "Apple  released it", "Apple | ORG")
+    assert cache.get("entities", "Apple released it") == "Apple | ORG"
+    assert cache.get("entities", "apple released it") is None
+
+
+def test_semantic_lookup_finds_closest_entry_of_same_task():
+    cache = ResponseCache(semantic=True, max_distance=0.05)
+    cache.set("summarize", "a", "summary a", [1.0, 0.0, 0.0])
+    cache.set("summarize", "b", "summary b", [0.0, 1.0, 0.0])
+    cache.set("classify", "c", "label c", [0.0, 0.0, 1.0])
+    assert cache.get("summarize", "unseen", [0.99, 0.05, 0.0]) == "summary a"
+    assert cache.get("summarize", "unseen", [0.0, 0.0, 1.0]) is None  # only the classify entry is close
+    assert cache.get("summarize", "unseen", [0.7, 0.7, 0.0]) is None  # nothing within the distance
+
+
+def test_semantic_rows_follow_eviction_and_expiry():
+    cache = ResponseCache(max_entries=2, semantic=True, max_distance=0.05)
+    cache.set("summarize", "a", "summary a", [1.0, 0.0])
+    cache.set("summarize", "b", "summary b", [0.0, 1.0])
+    cache.set("summarize", "c", "summary c", [0.0, 1.0])  # evicts a
+    assert cache.get("summarize", "unseen", [1.0, 0.0]) is None
+    assert len(cache._row_of) == 2
+
+    cache.ttl = -1
+    cache.set("summarize", "d", "summary d", [1.0, 0.0])
+    assert cache.get("summarize", "unseen", [1.0, 0.0]) is None  # d already expired
+
+
+def test_embedding_dimension_change_starts_a_new_matrix():
+    cache = ResponseCache(semantic=True, max_distance=0.05)
+    cache.set("summarize", "a", "summary a", [1.0, 0.0])
+    cache.set("summarize", "b", "summary b", [0.0, 0.0, 1.0])
+    assert cache.get("summarize", "unseen", [0.0, 0.0, 1.0]) == "summary b"
+    assert cache.get("summarize", "unseen", [1.0, 0.0]) is None
+    assert cache.get("summarize", "a") == "summary a"  # exact hits are unaffected
+
+
+def test_semantic_lookup_scales_to_a_full_cache():
+    cache = ResponseCache(max_entries=2000, semantic=True)
+    vectors = np.random.default_rng(0).normal(size=(2000, 1024))
+    for i, vector in enumerate(vectors):
+        cache.set("summarize", f"text {i}", i, vector.tolist())
+    started = time.perf_counter()
+    assert cache.get("summarize", "unseen", vectors[1234].tolist()) == 1234
+    assert time.perf_counter() - started < 0.5
@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+from app.rag.document_ingestion import Document
+from app.rag.retrieval_service import RetrievalService
+
+
+def _candidates():
+    return [
+        Document(id="a", text="alpha", embedding=[], distance=0.30),
+        Document(id="b", text="beta", embedding=[], distance=0.32),
+        Document(id="c", text="gamma", embedding=[], distance=0.35),
+    ]
+
+
+def _rank(service, candidates, top_k=2):
+    return asyncio.run(service._rank_candidates("q", candidates, top_k, time.perf_counter(), 10_000))
+
+
+def test_vector_order_scores_are_cosine_similarities():
+    results = _rank(RetrievalService(), _candidates()[:1])
+    assert results == [{
+        "id": "a", "text": "alpha", "score": 0.7, "source": "vector",
+        "vector_score": 0.7, "rerank_score": None,
+    }]
+
+
+def test_reranked_results_report_both_scores(monkeypatch):
+    service = RetrievalService()
+
+    async def rerank_scores(query, candidates, timeout):
+        # "c" is left unscored and keeps its vector rank after the scored ones
+        return {"a": 2.5, "b": 7.0}
+
+    monkeypatch.setattr(service, "_rerank_scores", rerank_scores)
+    results = _rank(service, _candidates(), top_k=3)
+    assert [r["id"] for r in results] == ["b", "a", "c"]
+    assert all(r["source"] == "rerank" for r in results)
+    assert [r["score"] for r in results] == [r["rerank_score"] for r in results] == [7.0, 2.5, None]
+    assert [round(r["vector_score"], 2) for r in results] == [0.68, 0.7, 0.65]